@@ -0,0 +1,206 @@
+# asset_cache.py (The Prop Room)
+import os
+import json
+import math
+import hashlib
+import subprocess
+import threading
+import numpy as np
+import imageio_ffmpeg
+
+# --- ASSET LOCATIONS (Resolved once per process) ---
+EMOJI_DIR = os.path.join("assets", "emojis")
+POP_SFX_CANDIDATES = ["assets/pop.mp3", "assets/Pop.mp3", "assets/sfx/pop.mp3"]
+TRANSITION_SFX_CANDIDATES = ["assets/whoosh_fast.mp3", "assets/transition.mp3"]
+
+RESOLVED = {}
+
+def resolve_asset(candidates):
+    """First existing path from candidates (checked once, then remembered), or None."""
+    key = tuple(candidates)
+    if key not in RESOLVED:
+        RESOLVED[key] = next((p for p in candidates if os.path.exists(p)), None)
+    return RESOLVED[key]
+
+def get_pop_sfx():
+    return resolve_asset(POP_SFX_CANDIDATES)
+
+def get_transition_sfx():
+    return resolve_asset(TRANSITION_SFX_CANDIDATES)
+
+# --- EMOJI SPRITES ---
+POP_FADE = 0.05 # Crossfade-in length of the emoji pop (seconds)
+
+class SpriteCache:
+    """
+    Decoded, pre-scaled emoji sprites.
+    Each PNG is decoded once per process; each (path, width) is resized once.
+    A sprite is {'rgba', 'rgb', 'alpha', 'w', 'h', 'pop_alpha'}: uint8 RGBA / RGB arrays,
+    a float 0-1 alpha mask, and the pop fade-in masks precomputed for the render fps.
+    """
+
+    def __init__(self, fps=24):
+        self.fps = fps
+        self.decoded = {}
+        self.sprites = {}
+        self.lock = threading.Lock()
+
+    def _decode(self, path):
+        if path not in self.decoded:
+            from PIL import Image
+            with Image.open(path) as img:
+                self.decoded[path] = img.convert("RGBA")
+        return self.decoded[path]
+
+    def get(self, path, width):
+        """Sprite for path scaled to width (height keeps the aspect ratio). None if unreadable."""
+        width = max(1, int(width))
+        key = (path, width)
+        with self.lock:
+            if key in self.sprites: return self.sprites[key]
+            try:
+                from PIL import Image
+                img = self._decode(path)
+                height = max(1, int(img.height * width / img.width))
+                rgba = np.array(img.resize((width, height), Image.LANCZOS))
+            except Exception as e:
+                print(f"   [Overlay Error] Could not load emoji: {e}")
+                self.sprites[key] = None
+                return None
+
+            alpha = rgba[:, :, 3] / 255.0
+            frames = max(1, int(math.ceil(POP_FADE * self.fps)))
+            sprite = {
+                'rgba': rgba, 'rgb': np.ascontiguousarray(rgba[:, :, :3]), 'alpha': alpha,
+                'w': width, 'h': height,
+                'pop_alpha': [alpha * min(1.0, (i / float(self.fps)) / POP_FADE) for i in range(frames)],
+            }
+            self.sprites[key] = sprite
+            return sprite
+
+    def preload(self, widths):
+        """Decodes every PNG in assets/emojis and scales it to each width (e.g. Shorts + Long)."""
+        if not os.path.exists(EMOJI_DIR): return 0
+        count = 0
+        for name in sorted(os.listdir(EMOJI_DIR)):
+            if not name.lower().endswith(".png"): continue
+            for w in widths:
+                if self.get(os.path.join(EMOJI_DIR, name), w) is not None: count += 1
+        return count
+
+    def pop_mask(self, sprite, t):
+        """Alpha mask of the sprite t seconds after it pops in."""
+        if t >= POP_FADE: return sprite['alpha']
+        return sprite['pop_alpha'][min(len(sprite['pop_alpha']) - 1, max(0, int(t * self.fps)))]
+
+# --- SHARED INSTANCE ---
+SPRITES = SpriteCache()
+
+# --- DECODED AUDIO STORE (Content-addressed PCM) ---
+PCM_DIR = os.path.join("cache", "pcm")
+PCM_RATE = 44100
+AUDIO_EXTENSIONS = ('.mp3', '.wav', '.m4a', '.aac', '.ogg', '.flac')
+
+def decode_pcm(path, rate=PCM_RATE):
+    """Decodes any audio (or the audio of a video) to an (n, 2) float32 array at rate Hz."""
+    cmd = [imageio_ffmpeg.get_ffmpeg_exe(), "-hide_banner", "-loglevel", "error", "-i", path,
+           "-vn", "-f", "f32le", "-acodec", "pcm_f32le", "-ac", "2", "-ar", str(rate), "pipe:1"]
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True)
+    return np.frombuffer(result.stdout, dtype=np.float32).reshape(-1, 2)
+
+class PCMStore:
+    """
+    Decoded 44.1 kHz stereo float32 PCM for SFX assets, stored as .npy files named by the
+    SHA-1 of the source file and opened with mmap.
+    index.json maps path -> {size, mtime, digest}, so an unchanged file is never re-hashed,
+    and an identical file under another name (or a renamed one) is never re-decoded.
+    """
+
+    def __init__(self, store_dir=PCM_DIR, rate=PCM_RATE):
+        self.store_dir = store_dir
+        self.rate = rate
+        self.index_path = os.path.join(store_dir, "index.json")
+        self.index = None
+        self.arrays = {}
+        self.lock = threading.Lock()
+        self.decoded = 0
+
+    def _load_index(self):
+        if self.index is None:
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    self.index = json.load(f)
+            except Exception:
+                self.index = {}
+        return self.index
+
+    def _save_index(self):
+        try:
+            os.makedirs(self.store_dir, exist_ok=True)
+            tmp = self.index_path + f".{os.getpid()}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self.index, f, indent=1)
+            os.replace(tmp, self.index_path)
+        except Exception as e:
+            print(f"   [PCM Store] Could not save index: {e}")
+
+    @staticmethod
+    def _digest(path):
+        h = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+        return h.hexdigest()
+
+    def _decode(self, path, npy_path):
+        data = decode_pcm(path, self.rate)
+        os.makedirs(self.store_dir, exist_ok=True)
+        tmp = npy_path + f".{os.getpid()}.tmp.npy"
+        np.save(tmp, data)
+        os.replace(tmp, npy_path) # Atomic: parallel workers never read half-written arrays
+        self.decoded += 1
+
+    def get(self, path):
+        """(n, 2) float32 PCM array for an audio file (read-only mmap), or None if it can't be decoded."""
+        arr = self.arrays.get(path)
+        if arr is not None: return arr
+
+        with self.lock:
+            if path in self.arrays: return self.arrays[path]
+            try:
+                st = os.stat(path)
+            except OSError:
+                return None
+
+            index = self._load_index()
+            key = os.path.abspath(path)
+            entry = index.get(key)
+            try:
+                if not entry or entry['size'] != st.st_size or entry['mtime'] != st.st_mtime:
+                    entry = {'size': st.st_size, 'mtime': st.st_mtime, 'digest': self._digest(path)}
+                    index[key] = entry
+                    self._save_index()
+
+                npy_path = os.path.join(self.store_dir, f"{entry['digest']}_{self.rate}.npy")
+                if not os.path.exists(npy_path):
+                    self._decode(path, npy_path)
+                arr = np.load(npy_path, mmap_mode='r')
+            except Exception as e:
+                print(f"   [Audio Error] Could not load {os.path.basename(path)}: {e}")
+                return None
+
+            self.arrays[path] = arr
+            return arr
+
+    def warm(self, folders=("assets", os.path.join("assets", "sfx"))):
+        """Decodes (or maps) every audio file directly inside the given folders. Returns the count."""
+        count = 0
+        for folder in folders:
+            if not os.path.isdir(folder): continue
+            for name in sorted(os.listdir(folder)):
+                if name.lower().endswith(AUDIO_EXTENSIONS):
+                    if self.get(os.path.join(folder, name)) is not None: count += 1
+        return count
+
+# --- SHARED INSTANCE ---
+PCM = PCMStore()
@@ -0,0 +1,336 @@
+# audio_engine.py (The Sound Desk)
+import os
+import wave
+import random
+import subprocess
+import numpy as np
+import imageio_ffmpeg
+import config
+import asset_cache
+import render_cache
+import music_library
+
+RATE = asset_cache.PCM_RATE
+
+# --- THE TIMELINE BUFFER ---
+class AudioTimeline:
+    """
+    One preallocated stereo float32 buffer for the whole video.
+    Every layer (narration, SFX, music, chime) is added in place with vectorised
+    gain / fade envelopes, then written once as 16-bit PCM.
+    """
+
+    def __init__(self, duration, rate=RATE):
+        self.rate = rate
+        self.duration = duration
+        self.buffer = np.zeros((max(1, int(round(duration * rate))), 2), dtype=np.float32)
+
+    def place(self, data, start=0.0, gain=1.0, fade_in=0.0, fade_out=0.0, end=None):
+        """
+        Adds data (n, 2) at start seconds. end (seconds) clips the layer, e.g. to its scene.
+        Fades are applied to the placed (clipped) segment. Returns the number of samples placed.
+        """
+        if data is None or len(data) == 0: return 0
+        s = int(round(start * self.rate))
+        if s < 0:
+            data = data[-s:]
+            s = 0
+        limit = len(self.buffer) if end is None else min(len(self.buffer), int(round(end * self.rate)))
+        n = min(len(data), limit - s)
+        if n <= 0: return 0
+
+        seg = np.array(data[:n], dtype=np.float32) # Copy: sources may be read-only mmaps
+        if gain != 1.0: seg *= gain
+        apply_fades(seg, fade_in, fade_out, self.rate)
+        self.buffer[s:s + n] += seg
+        return n
+
+    def fade_out(self, seconds):
+        apply_fades(self.buffer, 0.0, seconds, self.rate)
+
+    def write_wav(self, path, block=RATE * 10):
+        """Clips to [-1, 1] and writes 16-bit stereo PCM in blocks (no full-size int16 copy)."""
+        with wave.open(path, 'wb') as wav:
+            wav.setnchannels(2)
+            wav.setsampwidth(2)
+            wav.setframerate(self.rate)
+            for i in range(0, len(self.buffer), block):
+                chunk = np.clip(self.buffer[i:i + block], -1.0, 1.0)
+                wav.writeframes((chunk * 32767.0).astype('<i2').tobytes())
+        return path
+
+def apply_fades(seg, fade_in, fade_out, rate=RATE):
+    """Linear fade-in / fade-out envelopes, in place."""
+    n = len(seg)
+    if fade_in > 0:
+        k = min(n, int(fade_in * rate))
+        if k > 0: seg[:k] *= np.linspace(0.0, 1.0, k, dtype=np.float32)[:, None]
+    if fade_out > 0:
+        k = min(n, int(fade_out * rate))
+        if k > 0: seg[n - k:] *= np.linspace(1.0, 0.0, k, dtype=np.float32)[:, None]
+
+# --- MUSIC BED (Streamed in fixed-size blocks) ---
+CROSSFADE = 2.0     # Long-form playlist: each track fades in / out over this, overlapping its neighbour
+BED_BLOCK = RATE * 5
+
+class PCMStream:
+    """Sequential (n, 2) float32 reads from an FFmpeg decode pipe. loop=True repeats the file; past the end reads are silence."""
+
+    def __init__(self, path, rate=RATE, loop=False, duration=None):
+        cmd = [imageio_ffmpeg.get_ffmpeg_exe(), "-hide_banner", "-loglevel", "error"]
+        if loop: cmd += ["-stream_loop", "-1"]
+        cmd += ["-i", path, "-vn"]
+        if duration: cmd += ["-t", f"{duration:.3f}"]
+        cmd += ["-f", "f32le", "-acodec", "pcm_f32le", "-ac", "2", "-ar", str(rate), "pipe:1"]
+        self.proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        self.done = False
+
+    def read(self, n):
+        out = np.zeros((n, 2), dtype=np.float32)
+        if self.done: return out
+        raw = self.proc.stdout.read(n * 8)
+        got = len(raw) // 8
+        if got: out[:got] = np.frombuffer(raw[:got * 8], dtype=np.float32).reshape(-1, 2)
+        if got < n: self.close()
+        return out
+
+    def close(self):
+        if self.done: return
+        self.done = True
+        try:
+            self.proc.stdout.close()
+            self.proc.kill()
+            self.proc.wait()
+        except Exception: pass
+
+def plan_music_bed(songs, duration, mode="Shorts"):
+    """
+    Same rules as the old MoviePy bed:
+    Shorts (or a single song): one random track looped to length, x0.5, 2s fade-out.
+    Long: shuffled playlist from indexed durations, 2s fades crossfading into each other, x0.2, 3s fade-out.
+    Returns {'tracks': [{path, start, length, fade_in, fade_out, loop}], 'gain', 'fade_out'} (seconds) or None.
+    """
+    songs = list(songs)
+    if not songs: return None
+
+    if mode == "Shorts" or len(songs) < 2:
+        song = random.choice(songs)
+        print(f"   [Music] Looping track: {os.path.basename(song)}")
+        return {'tracks': [{'path': song, 'start': 0.0, 'length': duration, 'fade_in': 0.0, 'fade_out': 0.0, 'loop': True}],
+                'gain': 0.50, 'fade_out': 2.0}
+
+    print(f"   [Music] DJ Playlist ({len(songs)} tracks available)...")
+    tracks, pos = [], 0.0
+    for song in music_library.LIBRARY.plan_playlist(songs, duration, overlap=CROSSFADE):
+        if pos >= duration: break
+        length = music_library.LIBRARY.duration(song) or 0.0
+        if length <= 0: continue
+        tracks.append({'path': song, 'start': pos, 'length': length, 'fade_in': CROSSFADE, 'fade_out': CROSSFADE, 'loop': False})
+        pos += max(length - CROSSFADE, 0.5)
+    if not tracks: return None
+    return {'tracks': tracks, 'gain': 0.2, 'fade_out': 3.0}
+
+def iter_music_bed(plan, duration, rate=RATE, block=BED_BLOCK):
+    """
+    Renders a planned bed block by block: yields (first_sample, (n, 2) float32).
+    Only the tracks overlapping the current block have a decoder open, so memory stays
+    at one block per playing track whatever the video length.
+    """
+    total = max(1, int(round(duration * rate)))
+    tracks = [dict(t, s0=int(round(t['start'] * rate)), s1=min(total, int(round((t['start'] + t['length']) * rate))))
+              for t in plan['tracks']]
+    streams = {}
+    fade_out = int(plan['fade_out'] * rate)
+
+    try:
+        for b0 in range(0, total, block):
+            b1 = min(total, b0 + block)
+            out = np.zeros((b1 - b0, 2), dtype=np.float32)
+            for k, t in enumerate(tracks):
+                if t['s1'] <= b0 or t['s0'] >= b1: continue
+                if k not in streams:
+                    streams[k] = PCMStream(t['path'], rate, loop=t['loop'], duration=t['length'])
+                lo, hi = max(b0, t['s0']), min(b1, t['s1'])
+                chunk = streams[k].read(hi - lo)
+                # Envelope from the sample's position in the track, so fades are exact across block edges
+                pos = np.arange(lo - t['s0'], hi - t['s0'], dtype=np.float32)
+                env = np.ones(hi - lo, dtype=np.float32)
+                if t['fade_in'] > 0: env = np.minimum(env, pos / (t['fade_in'] * rate))
+                if t['fade_out'] > 0: env = np.minimum(env, (t['s1'] - t['s0'] - pos) / (t['fade_out'] * rate))
+                out[lo - b0:hi - b0] += chunk * env[:, None]
+                if hi >= t['s1']: streams.pop(k).close()
+
+            out *= plan['gain']
+            if fade_out > 0 and b1 > total - fade_out:
+                pos = np.arange(b0, b1, dtype=np.float32)
+                out *= np.clip((total - pos) / fade_out, 0.0, 1.0)[:, None]
+            yield b0, out
+    finally:
+        for stream in streams.values(): stream.close()
+
+def write_music_bed(songs, duration, path, mode="Shorts", rate=RATE, block=BED_BLOCK, gain=None):
+    """
+    Streams the bed into one 16-bit stereo WAV (constant memory). gain: optional ducking_gain()
+    result baked into the bed. Returns path, or None if there is no music.
+    """
+    plan = plan_music_bed(songs, duration, mode)
+    if not plan: return None
+    with wave.open(path, 'wb') as wav:
+        wav.setnchannels(2)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        for start, chunk in iter_music_bed(plan, duration, rate, block):
+            if gain is not None: chunk = apply_gain(chunk, start, gain)
+            wav.writeframes((np.clip(chunk, -1.0, 1.0) * 32767.0).astype('<i2').tobytes())
+    return path
+
+# --- DUCKING (Music dips under the narration) ---
+ENVELOPE_HOP = RATE // 100   # 10 ms RMS frames
+ENVELOPE_DIR = os.path.join("cache", "envelopes")
+
+class NarrationEnvelopes:
+    """
+    10 ms RMS envelopes of narration tracks, stored as cache/envelopes/<sha1>.npy by file content,
+    so a re-mix of the same TTS file (resume, re-render, second language pass) never recomputes it.
+    """
+
+    def __init__(self, store_dir=ENVELOPE_DIR, hop=ENVELOPE_HOP):
+        self.store_dir = store_dir
+        self.hop = hop
+        self.digests = render_cache.FileDigests(os.path.join(store_dir, "digests.json"))
+        self.memo = {}
+
+    @staticmethod
+    def compute(data, hop=ENVELOPE_HOP):
+        """RMS of the mono downmix per hop samples (vectorised). Returns float32 (n_hops,)."""
+        mono = np.asarray(data, dtype=np.float32).mean(axis=1)
+        n = len(mono) // hop
+        if n == 0: return np.zeros(0, dtype=np.float32)
+        frames = mono[:n * hop].reshape(n, hop)
+        return np.sqrt((frames * frames).mean(axis=1)).astype(np.float32)
+
+    def get(self, path, data=None):
+        """Envelope of a narration file. data: its already-decoded PCM (avoids a second decode on a miss)."""
+        digest = self.digests.digest(path)
+        if digest is None: return None
+        if digest in self.memo: return self.memo[digest]
+        npy_path = os.path.join(self.store_dir, f"{digest}_{self.hop}.npy")
+        try:
+            env = np.load(npy_path)
+        except Exception:
+            if data is None: data = asset_cache.decode_pcm(path)
+            env = self.compute(data, self.hop)
+            try:
+                os.makedirs(self.store_dir, exist_ok=True)
+                tmp = npy_path + f".{os.getpid()}.tmp.npy"
+                np.save(tmp, env)
+                os.replace(tmp, npy_path)
+                self.digests.save()
+            except Exception as e:
+                print(f"   [Ducking] Could not store envelope: {e}")
+        self.memo[digest] = env
+        return env
+
+ENVELOPES = NarrationEnvelopes()
+
+def ducking_curve(envelope, threshold=0.01, under=0.6, open_gain=1.5, hold=0.35, ramp=0.25, hop=ENVELOPE_HOP, rate=RATE):
+    """
+    Music gain per envelope frame: open_gain between lines, under while someone speaks.
+    Speech frames are widened by hold seconds on both sides (the dip starts just before a line
+    and outlasts short pauses), then a ramp-second moving average smooths the transitions.
+    All convolutions, no per-sample Python.
+    """
+    frames_per_s = rate / float(hop)
+    active = (envelope > threshold).astype(np.float32)
+    k_hold = max(1, int(hold * frames_per_s) * 2 + 1)
+    held = np.convolve(active, np.ones(k_hold, dtype=np.float32), mode='same') > 0
+    target = np.where(held, under, open_gain).astype(np.float32)
+    k_ramp = max(1, int(ramp * frames_per_s))
+    padded = np.pad(target, (k_ramp // 2, k_ramp - 1 - k_ramp // 2), mode='edge')
+    return np.convolve(padded, np.ones(k_ramp, dtype=np.float32) / k_ramp, mode='valid').astype(np.float32)
+
+def add_voice(voice, env, offset, duration):
+    """Merges one narration's envelope into the timeline's voice track at offset (clipped to duration)."""
+    h0 = int(round(offset * RATE)) // ENVELOPE_HOP
+    n = max(0, min(len(env), int(duration * RATE) // ENVELOPE_HOP, len(voice) - h0))
+    voice[h0:h0 + n] = np.maximum(voice[h0:h0 + n], env[:n])
+
+def narration_voice(segments, total):
+    """Voice track (10 ms envelope) of a stitched timeline's narrations, from the envelope store."""
+    voice = np.zeros(int(total * RATE) // ENVELOPE_HOP + 1, dtype=np.float32)
+    offset = 0.0
+    for seg in segments:
+        if seg.get('narration') and os.path.exists(seg['narration']):
+            try:
+                env = ENVELOPES.get(seg['narration'])
+                if env is not None: add_voice(voice, env, offset, seg['duration'])
+            except Exception as e:
+                print(f"   [Ducking] Could not read {os.path.basename(seg['narration'])}: {e}")
+        offset += seg['duration']
+    return voice
+
+def ducking_gain(voice, music_volume):
+    """(sample positions, music gain) over a voice track: ducking_curve at the configured levels, times music_volume."""
+    curve = ducking_curve(voice, under=float(getattr(config, 'MUSIC_DUCK_UNDER', 0.6)),
+                          open_gain=float(getattr(config, 'MUSIC_DUCK_OPEN', 1.5))) * music_volume
+    hops = (np.arange(len(curve)) + 0.5) * ENVELOPE_HOP
+    print(f"   [Ducking] Music x{curve.min():.2f} under narration, up to x{curve.max():.2f} between lines.")
+    return hops, curve
+
+def apply_gain(chunk, start, gain):
+    """A music block starting at sample start, scaled by the ducking gain (10 ms curve interpolated per sample)."""
+    hops, curve = gain
+    return chunk * np.interp(np.arange(start, start + len(chunk)), hops, curve).astype(np.float32)[:, None]
+
+# --- WHOLE-VIDEO MIX ---
+def mix_timeline(segments, music_songs=None, music_volume=0.30, mode="Shorts",
+                 chime_path=None, chime_start=0.5, chime_volume=0.6):
+    """
+    segments: stitched order, [{duration, narration, sfx: [{path, start, volume}]}].
+    narration is a file decoded per call; SFX + chime come from the shared PCM store.
+    Every layer is clipped to its own segment, so nothing bleeds into the next scene.
+    Returns the AudioTimeline.
+    """
+    total = sum(seg['duration'] for seg in segments)
+    mix = AudioTimeline(total)
+    ducking = bool(music_songs) and getattr(config, 'MUSIC_DUCKING', True)
+    voice = np.zeros(len(mix.buffer) // ENVELOPE_HOP + 1, dtype=np.float32) if ducking else None
+
+    offset = 0.0
+    for seg in segments:
+        end = offset + seg['duration']
+        if seg.get('narration') and os.path.exists(seg['narration']):
+            try:
+                data = asset_cache.decode_pcm(seg['narration'])
+                mix.place(data, offset, end=end)
+                if ducking:
+                    add_voice(voice, ENVELOPES.get(seg['narration'], data), offset, seg['duration'])
+            except Exception as e:
+                print(f"   [Audio Error] Could not decode {os.path.basename(seg['narration'])}: {e}")
+
+        for sfx in seg.get('sfx', []):
+            if sfx['start'] >= seg['duration']: continue
+            data = asset_cache.PCM.get(sfx['path'])
+            if data is None: continue
+            # Same rule as load_sfx_safe: drop tails shorter than 50ms
+            if min(len(data) / float(RATE), seg['duration'] - sfx['start']) < 0.05: continue
+            mix.place(data, offset + sfx['start'], gain=sfx['volume'], end=end)
+        offset = end
+
+    if music_songs:
+        try:
+            plan = plan_music_bed(music_songs, total, mode)
+            if plan:
+                gain = ducking_gain(voice, music_volume) if ducking else None
+                for start, chunk in iter_music_bed(plan, total, mix.rate):
+                    if gain is None:
+                        mix.buffer[start:start + len(chunk)] += chunk * music_volume
+                    else:
+                        mix.buffer[start:start + len(chunk)] += apply_gain(chunk, start, gain)
+        except Exception as e:
+            print(f"   [Error] Music generation failed: {e}")
+
+    if chime_path and os.path.exists(chime_path):
+        mix.place(asset_cache.PCM.get(chime_path), chime_start, gain=chime_volume)
+
+    return mix
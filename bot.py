@@ -14,9 +14,11 @@ import shutil
 # --- IMPORT TEAMS ---
 import generators    # The Writer
 import media_engine  # The Editor
+import ffmpeg_engine # The Fast Editor
 import studio        # The Manager
 import config        # Config
 import translator    # The Language Brain
+import journal       # The Logbook
 
 # --- SYSTEM CONFIG ---
 socket.setdefaulttimeout(30)
@@ -68,6 +70,76 @@ def select_language_mode():
     print("   [System] Target set to: BOTH (Dual-Channel)")
     return "BOTH"
 
+def render_twin_fanout(timeline, video_files, audio_files, session_id, music_data, session_journal):
+    """
+    Translates + voices the Hindi twin up front, then renders English and Hindi in one fan-out pass.
+    The Hindi timeline, audio and video are journaled, so the Hindi step later only uploads.
+    Returns the English video, or None (caller falls back to the standard render).
+    """
+    print("   [System] Preparing Hindi twin for a shared render...")
+    hindi_timeline = session_journal.get('hindi_timeline') or translator.create_hindi_timeline(timeline)
+    if not hindi_timeline: return None
+    session_journal.record('hindi_timeline', hindi_timeline)
+    
+    hindi_session_id = session_id + "_HINDI"
+    hindi_audio_files = asyncio.run(translator.generate_hindi_audio(hindi_timeline, hindi_session_id, journal=session_journal))
+    if not hindi_audio_files: return None
+    
+    results = media_engine.combine_scenes_fanout([
+        {'timeline': timeline, 'audio_files': audio_files, 'session_id': session_id},
+        {'timeline': hindi_timeline, 'audio_files': hindi_audio_files, 'session_id': hindi_session_id},
+    ], video_files, music_data)
+    
+    if results.get(hindi_session_id):
+        session_journal.record('hindi_render', {'path': results[hindi_session_id]}, [results[hindi_session_id]])
+    return results.get(session_id)
+
+def resume_from_journal(session_id):
+    """
+    Journal-driven rescue: restores the script, mode and music choice from the session journal,
+    then redoes only TTS / downloads whose files are missing or changed, and renders only if the
+    finished video isn't recorded (journaled scenes and stitch are kept, the rest re-rendered).
+    Returns the same 5-tuple as resume_workflow ((None, None, None, None, None) if the scene assets
+    cannot be restored), or None if the journal has no script (the caller then scans temp/).
+    """
+    log = journal.SessionJournal(session_id)
+    script = log.get('script')
+    if not script or not script.get('timeline'):
+        print("   [Journal] No script recorded. Falling back to file scan...")
+        return None
+
+    session = log.get('session', {})
+    print(f"   [Journal] {len(log.summary())} stages on record ({session.get('mode', config.VIDEO_MODE)}, {session.get('target_lang', 'BOTH')}).")
+    config.VIDEO_MODE = session.get('mode', config.VIDEO_MODE)
+    timeline = script['timeline']
+
+    if script.get('description') and not os.path.exists("temp/description.txt"):
+        try:
+            with open("temp/description.txt", "w", encoding="utf-8") as f:
+                f.write(script['description'])
+        except: pass
+
+    music_data = tuple(log.get('music')) if log.get('music') else media_engine.get_music_mood()
+
+    audio_files = asyncio.run(generators.generate_segmented_audio(timeline, session_id, journal=log))
+    scene_durations = [media_engine.get_audio_duration(a, f"temp/timing_{i}_{session_id}.json") for i, a in enumerate(audio_files or [])]
+    video_files = generators.download_specific_scenes(timeline, session_id, target_durations=scene_durations, journal=log)
+    if not audio_files or not video_files:
+        print("   [Resume Error] Could not restore scene assets.")
+        return None, None, None, None, None
+
+    if log.done('render'):
+        final_video = log.get('render')['path']
+        print(f"   [Journal] Finished video on record: {final_video}")
+    elif session.get('target_lang') == "HINDI_ONLY":
+        final_video = "SKIPPED_ENGLISH"
+    else:
+        final_video = media_engine.combine_scenes(timeline, video_files, audio_files, session_id, music_data, journal=log,
+                                                   share_visuals=(session.get('target_lang', 'BOTH') == "BOTH"))
+        if final_video: log.record('render', {'path': final_video}, [final_video])
+
+    return final_video, session_id, timeline, video_files, audio_files
+
 def resume_workflow():
     """
     Advanced Rescue Logic: 
@@ -82,6 +154,11 @@ def resume_workflow():
     session_id = input(" > Enter the Session ID to resume (e.g., 9593): ").strip()
     if not session_id: return None, None, None, None, None
 
+    # --- JOURNALED SESSION: REDO ONLY THE MISSING STAGES ---
+    if journal.SessionJournal.exists(session_id):
+        restored = resume_from_journal(session_id)
+        if restored: return restored
+
     # --- DATA RECONSTRUCTION (Needed for Hindi) ---
     print(f"   [Resume] Rebuilding timeline data for Session {session_id}...")
     recovered_timeline = []
@@ -146,41 +223,46 @@ def resume_workflow():
             except: return 999999
         scene_files.sort(key=sort_key)
         
-        # Manual FFmpeg Stitch (Fast)
+        # Stream-Copy Stitch (Fast, re-encodes only mismatched segments)
         list_file = f"temp/stitch_list_{session_id}.txt"
-        with open(list_file, 'w', encoding='utf-8') as f:
-            for vid in scene_files:
-                abs_path = os.path.abspath(vid).replace('\\', '/')
-                f.write(f"file '{abs_path}'\n")
-
         stitched_filename = f"temp/stitched_{session_id}.mp4"
-        import imageio_ffmpeg
-        ffmpeg_exe = imageio_ffmpeg.get_ffmpeg_exe()
-        import subprocess
         
         try:
-            cmd = [ffmpeg_exe, "-y", "-f", "concat", "-safe", "0", "-i", list_file, "-c", "copy", stitched_filename]
-            subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            if not ffmpeg_engine.stitch_scenes(scene_files, stitched_filename, list_file):
+                raise Exception("stream-copy concat failed")
             
             if os.path.exists(stitched_filename):
                 print("   [Resume] Stitching complete. Adding music...")
                 
-                from moviepy.editor import VideoFileClip, AudioFileClip, CompositeAudioClip
-                from moviepy.audio.fx.all import volumex, audio_fadeout, audio_fadein
-                
-                final_video_clip = VideoFileClip(stitched_filename)
-                
                 print("   [Resume] Auto-selecting background music...")
                 mood_name, keywords = ("Upbeat", ["upbeat", "happy", "fun", "pop"]) 
-                bg_music = media_engine.create_background_music(mood_name, keywords, final_video_clip.duration)
-                
-                final_audio_list = [final_video_clip.audio]
-                if bg_music: final_audio_list.append(bg_music.fx(volumex, 0.15))
+                final_output_filename = f"finished_{session_id}.mp4"
                 
-                final_video_clip = final_video_clip.set_audio(CompositeAudioClip(final_audio_list))
+                # Silent scenes (AUDIO_ENGINE = 'numpy'): rebuild the whole soundtrack from the recovered narration
+                if not ffmpeg_engine.probe_media(stitched_filename)['has_audio']:
+                    segments = []
+                    for f in scene_files:
+                        idx = sort_key(f)
+                        if idx < len(recovered_audio_files):
+                            segments.append(media_engine.plan_soundtrack_segment(f, recovered_audio_files[idx], recovered_timeline[idx]['text'], idx == 0))
+                        else:
+                            segments.append(media_engine.plan_soundtrack_segment(f, None))
+                    if not media_engine.add_soundtrack_by_mix(stitched_filename, final_output_filename, segments, mood_name, keywords, music_volume=0.15, add_chime=False):
+                        raise Exception("soundtrack mix failed")
                 
-                final_output_filename = f"finished_{session_id}.mp4"
-                final_video_clip.write_videofile(final_output_filename, codec='libx264', audio_codec='aac', fps=24, preset='ultrafast', threads=4, logger=None)
+                # Audio-only remux (video stream copied), MoviePy re-encode as fallback
+                elif not media_engine.add_music_by_remux(stitched_filename, final_output_filename, mood_name, keywords, music_volume=0.15, add_chime=False):
+                    from moviepy.editor import VideoFileClip, CompositeAudioClip
+                    from moviepy.audio.fx.all import volumex
+                    
+                    final_video_clip = VideoFileClip(stitched_filename)
+                    bg_music = media_engine.create_background_music(mood_name, keywords, final_video_clip.duration)
+                    
+                    final_audio_list = [final_video_clip.audio]
+                    if bg_music: final_audio_list.append(bg_music.fx(volumex, 0.15))
+                    
+                    final_video_clip = final_video_clip.set_audio(CompositeAudioClip(final_audio_list))
+                    final_video_clip.write_videofile(final_output_filename, codec='libx264', audio_codec='aac', fps=24, preset='ultrafast', threads=4, logger=None)
                 
                 return final_output_filename, session_id, recovered_timeline, recovered_video_files, recovered_audio_files
         except Exception as e:
@@ -226,6 +308,7 @@ if __name__ == "__main__":
     english_videos = None
     english_music = None
     english_audio = None
+    session_journal = None
     
     # --- NEW SESSION ---
     if mode_action == "NEW":
@@ -239,8 +322,11 @@ if __name__ == "__main__":
             
             if sheets and youtube:
                 print(f"   [System] Session ID: {session_id}")
+                session_journal = journal.SessionJournal(session_id)
+                session_journal.record('session', {'mode': config.VIDEO_MODE, 'target_lang': target_lang})
                 
                 topic = generators.get_smart_topic(force_random=False)
+                session_journal.record('topic', topic)
                 
                 # --- FIX: SAVE TO HISTORY IMMEDIATELY ---
                 try:
@@ -255,15 +341,24 @@ if __name__ == "__main__":
                 raw_title, timeline, tags = generators.generate_scene_data(topic)
                 
                 if timeline:
+                    description = None
+                    try:
+                        with open("temp/description.txt", "r", encoding="utf-8") as f: description = f.read()
+                    except: pass
+                    session_journal.record('script', {'title': raw_title, 'timeline': timeline, 'tags': tags, 'description': description})
+                    
                     # Capture data for Hindi Render
                     english_timeline = timeline
                     music_data = media_engine.get_music_mood()
                     english_music = music_data
+                    session_journal.record('music', list(music_data) if music_data else None)
                     
-                    audio_files = asyncio.run(generators.generate_segmented_audio(timeline, session_id))
+                    audio_files = asyncio.run(generators.generate_segmented_audio(timeline, session_id, journal=session_journal))
                     english_audio = audio_files
                     
-                    video_files = generators.download_specific_scenes(timeline, session_id)
+                    # Narration lengths let the downloader trim footage to what each scene needs
+                    scene_durations = [media_engine.get_audio_duration(a, f"temp/timing_{i}_{session_id}.json") for i, a in enumerate(audio_files or [])]
+                    video_files = generators.download_specific_scenes(timeline, session_id, target_durations=scene_durations, journal=session_journal)
                     english_videos = video_files
                     
                     if audio_files and video_files:
@@ -274,9 +369,18 @@ if __name__ == "__main__":
                             final_video = "SKIPPED_ENGLISH" # Flag to signal success without file
                             hindi_ready = True
                         else:
+                            # Dual-Channel: English + Hindi from one decode of the visuals
+                            final_video = None
+                            if target_lang == "BOTH" and getattr(config, 'RENDER_FANOUT', True):
+                                final_video = render_twin_fanout(timeline, video_files, audio_files, session_id, music_data, session_journal)
+                            
                             # Standard Render
-                            final_video = media_engine.combine_scenes(timeline, video_files, audio_files, session_id, music_data)
-                            if final_video: hindi_ready = True
+                            if not final_video:
+                                final_video = media_engine.combine_scenes(timeline, video_files, audio_files, session_id, music_data, journal=session_journal,
+                                                                           share_visuals=(target_lang == "BOTH"))
+                            if final_video:
+                                hindi_ready = True
+                                session_journal.record('render', {'path': final_video}, [final_video])
                     else: print("\n[ERROR] Asset generation failed.")
                 else: print("\n[ERROR] Timeline generation failed.")
             else: print("\n[ERROR] Auth failed.")
@@ -296,12 +400,17 @@ if __name__ == "__main__":
             english_audio = r_audio
             hindi_ready = True
             english_music = ("Upbeat", ["upbeat"]) 
+            if journal.SessionJournal.exists(session_id):
+                session_journal = journal.SessionJournal(session_id)
+                if session_journal.get('music'): english_music = tuple(session_journal.get('music'))
+                target_lang = session_journal.get('session', {}).get('target_lang', target_lang)
+                topic = session_journal.get('topic') or topic
             sheets, youtube = studio.get_services(profile="english")
             try:
                 if os.path.exists("temp/description.txt"):
                     with open("temp/description.txt", "r", encoding="utf-8") as f:
                         c = f.read()
-                        if "TITLE:" in c: topic = c.split("TITLE:")[1].split("\n")[0].strip()
+                        if "TITLE:" in c and not session_journal: topic = c.split("TITLE:")[1].split("\n")[0].strip()
             except: pass
         else:
             print("[Error] Resume failed.")
@@ -368,7 +477,10 @@ if __name__ == "__main__":
         final_english_desc = f"""{english_title}\n\n{english_desc}\n\n SUBSCRIBE FOR MORE MYSTERIES\n{viral_hashtags_en}"""
 
         upload_choice = "y"
-        if mode_action == "RESUME":
+        if session_journal and session_journal.get('upload:english'):
+            print(f"   [Journal] English already uploaded: {session_journal.get('upload:english')}")
+            upload_choice = "n"
+        elif mode_action == "RESUME" and not session_journal:
             print("\n   [Resume Check] Did you ALREADY upload the English video?")
             already_done = generators.smart_input("   > (y/n): ", timeout=60, default_value="n").strip().lower()
             if already_done == 'y': upload_choice = "n"
@@ -385,6 +497,7 @@ if __name__ == "__main__":
             if video_link:
                 studio.update_sheet(sheets, topic, video_link, profile="english")
                 was_uploaded = True
+                if session_journal: session_journal.record('upload:english', video_link)
                 print(f"\n [SUCCESS] English Uploaded: {video_link}")
             else:
                 was_uploaded = False 
@@ -406,12 +519,18 @@ if __name__ == "__main__":
             
             # 1. Translate Script
             print("   [System] Translating script to Hinglish...")
-            hindi_timeline = translator.create_hindi_timeline(english_timeline)
+            hindi_timeline = session_journal.get('hindi_timeline') if session_journal else None
+            if not hindi_timeline:
+                hindi_timeline = translator.create_hindi_timeline(english_timeline)
+                if hindi_timeline and session_journal: session_journal.record('hindi_timeline', hindi_timeline)
             
             if hindi_timeline:
                 # 2. Translate Meta
                 print("   [System] Translating Title & Description...")
-                hindi_meta = translator.translate_batch_to_hinglish([english_title, english_desc])
+                hindi_meta = session_journal.get('hindi_meta') if session_journal else None
+                if not hindi_meta:
+                    hindi_meta = translator.translate_batch_to_hinglish([english_title, english_desc])
+                    if hindi_meta and session_journal: session_journal.record('hindi_meta', hindi_meta)
                 
                 hindi_title = english_title + " (Hinglish)" 
                 hindi_desc_body = english_desc
@@ -479,12 +598,17 @@ if __name__ == "__main__":
                 
                 # 3. Generate Audio
                 print("   [System] Generating Hindi Audio (Swara/Madhur)...")
-                hindi_audio_files = asyncio.run(translator.generate_hindi_audio(hindi_timeline, hindi_session_id))
+                hindi_audio_files = asyncio.run(translator.generate_hindi_audio(hindi_timeline, hindi_session_id, journal=session_journal))
                 
                 if hindi_audio_files:
                     # 4. Render Video
                     print("   [System] Rendering Hindi Video (Reusing Visuals)...")
-                    final_hindi_video = media_engine.combine_scenes(hindi_timeline, english_videos, hindi_audio_files, hindi_session_id, english_music)
+                    if session_journal and session_journal.done('hindi_render'):
+                        final_hindi_video = session_journal.get('hindi_render')['path']
+                    else:
+                        final_hindi_video = media_engine.combine_scenes(hindi_timeline, english_videos, hindi_audio_files, hindi_session_id, english_music, journal=session_journal,
+                                                                        share_visuals=(target_lang == "BOTH"))
+                        if final_hindi_video and session_journal: session_journal.record('hindi_render', {'path': final_hindi_video}, [final_hindi_video])
                     
                     if final_hindi_video:
                         print(f"\n   ✅ HINDI VIDEO GENERATED: {final_hindi_video}")
@@ -494,7 +618,11 @@ if __name__ == "__main__":
                         except: hindi_thumb = None
                         
                         wait_time = 600 if config.VIDEO_MODE == "Long" else 120
-                        hindi_choice = generators.smart_input(f"   > Upload Hindi? (y/n) [Auto-Yes {wait_time}s]: ", timeout=wait_time, default_value="y").strip().lower()
+                        if session_journal and session_journal.get('upload:hindi'):
+                            print(f"   [Journal] Hindi already uploaded: {session_journal.get('upload:hindi')}")
+                            hindi_choice = "n"
+                        else:
+                            hindi_choice = generators.smart_input(f"   > Upload Hindi? (y/n) [Auto-Yes {wait_time}s]: ", timeout=wait_time, default_value="y").strip().lower()
 
                         if hindi_choice == 'y':
                             print("   [System] Uploading to Hindi Channel...")
@@ -503,6 +631,7 @@ if __name__ == "__main__":
                                 h_link = studio.upload_to_youtube(h_youtube, final_hindi_video, hindi_thumb, hindi_title, final_hindi_desc, "", final_hindi_tags, profile="hindi")
                                 if h_link:
                                     studio.update_sheet(h_sheets, hindi_title, h_link, profile="hindi")
+                                    if session_journal: session_journal.record('upload:hindi', h_link)
                                     print(f"\n   🇮🇳 [SUCCESS] Hindi Version Uploaded: {h_link}")
                                 else:
                                     print("\n   [Warning] Hindi Upload failed. File saved.")
@@ -0,0 +1,338 @@
+# caption_engine.py (The Caption Printer)
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+import config
+
+# --- CACHE LOCATION ---
+CACHE_DIR = os.path.join("cache", "captions")
+
+# --- FONT FILES (ImageMagick font name -> TTF candidates, first existing wins) ---
+FONT_FILES = {
+    "Arial-Bold": [
+        "C:/Windows/Fonts/arialbd.ttf",
+        "/Library/Fonts/Arial Bold.ttf",
+        "/System/Library/Fonts/Supplemental/Arial Bold.ttf",
+        "/usr/share/fonts/truetype/msttcorefonts/Arial_Bold.ttf",
+        "/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf",
+        "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+        "/usr/share/fonts/dejavu/DejaVuSans-Bold.ttf",
+    ],
+    "Arial": [
+        "C:/Windows/Fonts/arial.ttf",
+        "/Library/Fonts/Arial.ttf",
+        "/System/Library/Fonts/Supplemental/Arial.ttf",
+        "/usr/share/fonts/truetype/msttcorefonts/Arial.ttf",
+        "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf",
+        "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+        "/usr/share/fonts/dejavu/DejaVuSans.ttf",
+    ],
+    "Impact": [
+        "C:/Windows/Fonts/impact.ttf",
+        "/Library/Fonts/Impact.ttf",
+        "/System/Library/Fonts/Supplemental/Impact.ttf",
+        "/usr/share/fonts/truetype/msttcorefonts/Impact.ttf",
+    ],
+}
+
+# --- IMAGEMAGICK SETUP (Optional) ---
+LEGACY_IMAGEMAGICK = r"C:\Program Files\ImageMagick-7.1.2-Q16-HDRI\magick.exe"
+
+def configure_imagemagick():
+    """Points MoviePy's TextClip at ImageMagick (config.IMAGEMAGICK_PATH, then the legacy install). Returns the binary or None."""
+    for path in [getattr(config, 'IMAGEMAGICK_PATH', None), LEGACY_IMAGEMAGICK]:
+        if path and os.path.exists(path):
+            from moviepy.config import change_settings
+            change_settings({"IMAGEMAGICK_BINARY": path})
+            return path
+    return None
+
+IMAGEMAGICK_CONFIGURED = False
+
+def get_backend():
+    """
+    CAPTION_BACKEND: 'pillow' (in-process), 'imagemagick' (TextClip) or 'auto' (default).
+    'auto' is Pillow unless config.IMAGEMAGICK_PATH names an existing binary; a PATH lookup
+    is not trusted ('convert' on Windows is the disk converter).
+    """
+    global IMAGEMAGICK_CONFIGURED
+    if not IMAGEMAGICK_CONFIGURED:
+        IMAGEMAGICK_CONFIGURED = True # Other TextClips (watermark, thumbnail) need it whatever the caption backend
+        try: configure_imagemagick()
+        except Exception: pass
+    backend = str(getattr(config, 'CAPTION_BACKEND', 'auto')).lower()
+    if backend in ("pillow", "imagemagick"): return backend
+    explicit = getattr(config, 'IMAGEMAGICK_PATH', None)
+    return "imagemagick" if explicit and os.path.exists(explicit) else "pillow"
+
+# --- PILLOW RASTERIZER ---
+def resolve_font(name):
+    """Finds a TTF file for an ImageMagick-style font name (config.CAPTION_FONTS overrides)."""
+    overrides = getattr(config, 'CAPTION_FONTS', {}) or {}
+    if name in overrides and os.path.exists(overrides[name]): return overrides[name]
+    if name and os.path.exists(name): return name
+    for path in FONT_FILES.get(name, []):
+        if os.path.exists(path): return path
+    return None
+
+FONT_OBJECTS = {}
+FONT_STAMPS = {}
+
+def font_stamp(name):
+    """Resolved font file + size + mtime (same fallback as load_font), so cached bitmaps follow font changes."""
+    if name not in FONT_STAMPS:
+        path = resolve_font(name) or resolve_font("Arial-Bold")
+        try:
+            st = os.stat(path)
+            FONT_STAMPS[name] = f"{os.path.abspath(path)}:{st.st_size}:{int(st.st_mtime)}"
+        except (OSError, TypeError):
+            FONT_STAMPS[name] = None # Built-in default font
+    return FONT_STAMPS[name]
+
+def load_font(name, size):
+    from PIL import ImageFont
+    key = (name, size)
+    if key not in FONT_OBJECTS:
+        path = resolve_font(name) or resolve_font("Arial-Bold")
+        try:
+            FONT_OBJECTS[key] = ImageFont.truetype(path, size) if path else ImageFont.load_default(size=size)
+        except Exception:
+            FONT_OBJECTS[key] = ImageFont.load_default()
+    return FONT_OBJECTS[key]
+
+def wrap_lines(text, font, max_width, stroke_width):
+    """Greedy word wrap (ImageMagick 'caption' method equivalent)."""
+    from PIL import Image, ImageDraw
+    draw = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+    lines, current = [], ""
+    for word in text.split():
+        trial = f"{current} {word}".strip()
+        box = draw.textbbox((0, 0), trial, font=font, stroke_width=stroke_width)
+        if current and (box[2] - box[0]) > max_width:
+            lines.append(current)
+            current = word
+        else:
+            current = trial
+    if current: lines.append(current)
+    return lines or [""]
+
+def render_text_pillow(text, font="Arial-Bold", font_size=80, color="white", stroke_color=None,
+                       stroke_width=0, scale=1.0, bg_color=None, max_width=None, align="center"):
+    """
+    Draws stroked, coloured text straight into an RGBA uint8 array (no subprocess).
+    The pop scale is applied to font size and stroke, which matches the TextClip.resize()
+    result of the ImageMagick path but stays sharp.
+    """
+    from PIL import Image, ImageDraw
+
+    size = max(1, int(round(font_size * scale)))
+    sw = int(round(stroke_width * scale)) if stroke_color and stroke_width else 0
+    font_obj = load_font(font, size)
+
+    lines = wrap_lines(text, font_obj, max_width - 2 * sw, sw) if max_width else [text]
+
+    ascent, descent = font_obj.getmetrics()
+    line_h = ascent + descent + 2 * sw
+    probe = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+    widths = []
+    for line in lines:
+        box = probe.textbbox((0, 0), line, font=font_obj, stroke_width=sw)
+        widths.append(box[2] - min(0, box[0]))
+
+    pad = 2
+    width = (max_width if max_width else max(widths)) + 2 * pad
+    height = line_h * len(lines) + 2 * pad
+
+    img = Image.new("RGBA", (max(1, width), max(1, height)), bg_color if bg_color else (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    for i, (line, w) in enumerate(zip(lines, widths)):
+        if align == "center": x = (width - w) / 2
+        elif align == "right": x = width - w - pad
+        else: x = pad
+        draw.text((x + sw, pad + i * line_h + sw), line, font=font_obj, fill=color,
+                  stroke_width=sw, stroke_fill=stroke_color if sw else None)
+    return np.array(img)
+
+# --- IMAGEMAGICK RASTERIZER ---
+def render_text_imagemagick(text, font="Arial-Bold", font_size=80, color="white", stroke_color=None,
+                            stroke_width=0, scale=1.0, bg_color=None, max_width=None, align="center"):
+    """TextClip (ImageMagick subprocess) into an RGBA uint8 array, pop scale applied by resize."""
+    from moviepy.editor import TextClip
+
+    kwargs = dict(fontsize=font_size, color=color, font=font)
+    if stroke_color and stroke_width:
+        kwargs.update(stroke_color=stroke_color, stroke_width=stroke_width)
+    if bg_color: kwargs['bg_color'] = bg_color
+    if max_width:
+        kwargs.update(method='caption', size=(max_width, None), align=align)
+    else:
+        kwargs['method'] = 'label'
+
+    txt = TextClip(text, **kwargs)
+    # Apply Pop Effect (Resize)
+    if scale > 1.0:
+        txt = txt.resize(scale)
+
+    rgb = txt.get_frame(0)
+    if txt.mask is not None:
+        alpha = (txt.mask.get_frame(0) * 255).astype('uint8')
+    else:
+        alpha = np.full(rgb.shape[:2], 255, dtype='uint8')
+    txt.close()
+    return np.dstack([rgb.astype('uint8'), alpha])
+
+def render_text(text, backend=None, **style):
+    """Rasterises text with the configured backend. Returns an RGBA uint8 array."""
+    backend = backend or get_backend()
+    if backend == "pillow":
+        return render_text_pillow(text, **style)
+    return render_text_imagemagick(text, **style)
+
+def to_image_clip(rgba):
+    """RGBA array -> MoviePy ImageClip with its alpha as mask."""
+    from moviepy.editor import ImageClip
+    mask = ImageClip(rgba[:, :, 3] / 255.0, ismask=True)
+    return ImageClip(rgba[:, :, :3]).set_mask(mask)
+
+# --- CAPTION BITMAP CACHE (Memory LRU + Disk Store) ---
+class CaptionCache:
+    """
+    Caches rendered caption bitmaps (RGBA uint8 arrays).
+    Key = text + font (and the file it resolves to) + size + colour + stroke + scale, so "THE"
+    in yellow is rasterised once and reused across scenes, videos and languages.
+    Layer 1: in-memory LRU (CAPTION_CACHE_ITEMS).
+    Layer 2: PNG files in cache/captions, pruned oldest-first above CAPTION_CACHE_MAX_MB.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_items=None, max_disk_mb=None):
+        self.cache_dir = cache_dir
+        self.max_items = max_items or getattr(config, 'CAPTION_CACHE_ITEMS', 256)
+        self.max_disk_bytes = int((max_disk_mb or getattr(config, 'CAPTION_CACHE_MAX_MB', 200)) * 1024 * 1024)
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self.writes_since_prune = 0
+
+    @staticmethod
+    def make_key(chunk, backend="imagemagick"):
+        style = {
+            'text': chunk['text'], 'font': chunk['font'], 'size': chunk['font_size'],
+            'color': chunk['color'], 'stroke': chunk['stroke'], 'stroke_width': chunk['stroke_width'],
+            'scale': round(float(chunk['scale']), 3), 'backend': backend,
+            'font_file': font_stamp(chunk['font']),
+        }
+        return hashlib.sha1(json.dumps(style, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".png")
+
+    def _remember(self, key, rgba):
+        self.memory[key] = rgba
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_items:
+            self.memory.popitem(last=False)
+
+    def get(self, chunk, rasterize, backend="imagemagick"):
+        """Returns the RGBA array for a caption chunk, calling rasterize(chunk) only on a full miss."""
+        key = self.make_key(chunk, backend)
+
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.hits_memory += 1
+                return self.memory[key]
+
+        path = self._disk_path(key)
+        if os.path.exists(path):
+            try:
+                from PIL import Image
+                with Image.open(path) as img:
+                    rgba = np.array(img.convert("RGBA"))
+                os.utime(path, None) # Touch -> keeps recently used bitmaps on prune
+                with self.lock:
+                    self.hits_disk += 1
+                    self._remember(key, rgba)
+                return rgba
+            except Exception:
+                pass
+
+        rgba = rasterize(chunk)
+        if rgba is None: return None
+
+        with self.lock:
+            self.misses += 1
+            self._remember(key, rgba)
+        self._store(path, rgba)
+        return rgba
+
+    def _store(self, path, rgba):
+        try:
+            from PIL import Image
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = path + f".{os.getpid()}.tmp"
+            Image.fromarray(rgba, 'RGBA').save(tmp, format="PNG", compress_level=1)
+            os.replace(tmp, path) # Atomic: parallel workers never read half-written files
+        except Exception as e:
+            print(f"   [Caption Cache] Could not store bitmap: {e}")
+            return
+
+        self.writes_since_prune += 1
+        if self.writes_since_prune >= 50:
+            self.writes_since_prune = 0
+            self.prune()
+
+    def prune(self):
+        """Deletes least recently used bitmaps until the disk store is under its size cap."""
+        files = []
+        total = 0
+        for root, _, names in os.walk(self.cache_dir):
+            for name in names:
+                if not name.endswith(".png"): continue
+                p = os.path.join(root, name)
+                try:
+                    st = os.stat(p)
+                    files.append((st.st_mtime, st.st_size, p))
+                    total += st.st_size
+                except OSError: pass
+
+        if total <= self.max_disk_bytes: return
+        files.sort()
+        for _, size, p in files:
+            try:
+                os.remove(p)
+                total -= size
+            except OSError: pass
+            if total <= self.max_disk_bytes * 0.9: break
+
+    def stats(self):
+        return {'memory_hits': self.hits_memory, 'disk_hits': self.hits_disk, 'misses': self.misses}
+
+    def reset_stats(self):
+        self.hits_memory = self.hits_disk = self.misses = 0
+
+# --- SHARED INSTANCE ---
+CACHE = CaptionCache()
+
+def rasterize_chunk(chunk, backend=None):
+    """Caption chunk (from media_engine.plan_captions) -> RGBA array."""
+    return render_text(
+        chunk['text'], backend=backend, font=chunk['font'], font_size=chunk['font_size'],
+        color=chunk['color'], stroke_color=chunk['stroke'], stroke_width=chunk['stroke_width'],
+        scale=chunk['scale'],
+    )
+
+def get_chunk_rgba(chunk):
+    """Cached caption bitmap for the active backend (rasterised only on a full miss)."""
+    backend = get_backend()
+    return CACHE.get(chunk, lambda c: rasterize_chunk(c, backend), backend=backend)
+
+def format_stats(stats):
+    hits = stats['memory_hits'] + stats['disk_hits']
+    total = hits + stats['misses']
+    rate = (100.0 * hits / total) if total else 0.0
+    return f"{hits}/{total} hits ({rate:.0f}%) | memory {stats['memory_hits']}, disk {stats['disk_hits']}, rendered {stats['misses']}"
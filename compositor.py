@@ -0,0 +1,192 @@
+# compositor.py (The Compositor)
+import subprocess
+import numpy as np
+import ffmpeg_engine
+
+# --- OVERLAYS (Pre-blended once, applied in place per frame) ---
+def make_overlay(rgb, alpha, x, y, start, end, pop_alphas=None, pop_fps=24):
+    """
+    A positioned bitmap ready for in-place blending.
+    rgb: uint8 (h, w, 3); alpha: float 0-1 (h, w); pop_alphas: optional fade-in masks, one per
+    frame at pop_fps (emoji pop). Premultiplied colour, inverse alpha and a float scratch buffer
+    are computed here, so blending a frame allocates nothing. Off-canvas parts are clipped by blend().
+    """
+    h, w = alpha.shape[:2]
+    variants = []
+    for a in (pop_alphas or []) + [alpha]:
+        a = np.asarray(a, dtype=np.float32)[:, :, None]
+        # +0.5: the final cast truncates, so this rounds to nearest
+        variants.append((rgb.astype(np.float32) * a + 0.5, 1.0 - a))
+    return {
+        'x': int(x), 'y': int(y), 'w': w, 'h': h, 'start': start, 'end': end,
+        'variants': variants, 'pop_frames': len(pop_alphas or []), 'pop_fps': pop_fps,
+        'scratch': np.empty((h, w, 3), dtype=np.float32),
+    }
+
+def blend(frame, overlay, t):
+    """Alpha-blends overlay onto frame (uint8, H x W x 3) in place at scene time t. Returns the pixels drawn (0 = not drawn)."""
+    if not (overlay['start'] <= t < overlay['end']): return 0
+    fh, fw = frame.shape[:2]
+    x0, y0 = overlay['x'], overlay['y']
+    fx0, fy0 = max(0, x0), max(0, y0)
+    fx1, fy1 = min(fw, x0 + overlay['w']), min(fh, y0 + overlay['h'])
+    if fx1 <= fx0 or fy1 <= fy0: return 0
+
+    k = int((t - overlay['start']) * overlay['pop_fps'])
+    premul, inv = overlay['variants'][k] if k < overlay['pop_frames'] else overlay['variants'][-1]
+    sy, sx = slice(fy0 - y0, fy1 - y0), slice(fx0 - x0, fx1 - x0)
+    region = frame[fy0:fy1, fx0:fx1]
+    scratch = overlay['scratch'][sy, sx]
+    np.multiply(region, inv[sy, sx], out=scratch)
+    np.add(scratch, premul[sy, sx], out=scratch)
+    np.copyto(region, scratch, casting='unsafe')
+    return (fx1 - fx0) * (fy1 - fy0) # Clipped rectangle, not the full bitmap
+
+# --- DAMAGE REGIONS (Only what is on screen, only where it is) ---
+class RegionCompositor:
+    """
+    Overlay pass for frames decoded elsewhere (MoviePy scene clips, the fan-out renderer).
+    Overlays are indexed by active time span; at t only the active ones are blended, each over
+    its own bounding box. A frame with no active overlay is returned as-is (no copy); otherwise
+    it is copied once into a reused buffer and the damaged rectangles are blended there.
+    The returned buffer is overwritten by the next call, so consume it before asking again.
+    """
+
+    def __init__(self, overlays):
+        self.overlays = list(overlays) # Draw order = z-order
+        self.starts = np.array([o['start'] for o in self.overlays], dtype=np.float64)
+        self.ends = np.array([o['end'] for o in self.overlays], dtype=np.float64)
+        self.buffer = None
+        self.stats = new_damage_stats()
+
+    def active(self, t):
+        """Overlays on screen at t, in draw order."""
+        if not self.overlays: return []
+        hits = np.flatnonzero((self.starts <= t) & (t < self.ends))
+        return [self.overlays[i] for i in hits]
+
+    def apply(self, frame, t):
+        """frame (H x W x 3) with every overlay active at t blended on."""
+        self.stats['frames'] += 1
+        self.stats['pixels'] += frame.shape[0] * frame.shape[1]
+        active = self.active(t)
+        if not active:
+            self.stats['passthrough'] += 1
+            return frame
+        if self.buffer is None or self.buffer.shape != frame.shape:
+            self.buffer = np.empty(frame.shape, dtype=np.uint8)
+        np.copyto(self.buffer, frame, casting='unsafe')
+        for overlay in active:
+            self.stats['blended_px'] += blend(self.buffer, overlay, t)
+        return self.buffer
+
+def new_damage_stats():
+    return {'frames': 0, 'passthrough': 0, 'blended_px': 0, 'pixels': 0}
+
+def merge_damage_stats(total, stats):
+    for k in total: total[k] += stats[k]
+    return total
+
+def format_damage_stats(stats):
+    """'x% of pixels blended, y% of frames passed through' for the render log."""
+    if not stats['frames']: return "no frames"
+    return (f"{100.0 * stats['blended_px'] / max(1, stats['pixels']):.1f}% of pixels blended, "
+            f"{100.0 * stats['passthrough'] / stats['frames']:.0f}% of {stats['frames']} frames passed through")
+
+# --- SOURCE FRAMES ---
+class FrameReader:
+    """
+    Decodes a visual with FFmpeg straight to target-size RGB24 (scale/crop/fps done by FFmpeg),
+    looped or held to duration, and fills a caller-owned buffer with readinto (no per-frame arrays).
+    """
+
+    def __init__(self, path, target_size, fps, duration, is_image=False):
+        target_w, target_h = target_size
+        cmd = [ffmpeg_engine.get_ffmpeg_exe(), "-hide_banner", "-loglevel", "error"]
+        if is_image:
+            cmd += ["-loop", "1", "-framerate", str(fps), "-t", f"{duration:.3f}", "-i", path]
+        else:
+            cmd += ["-stream_loop", "-1", "-t", f"{duration:.3f}", "-i", path]
+        cmd += ["-an", "-vf", ffmpeg_engine.fit_filter(target_w, target_h, fps).replace("format=yuv420p", "format=rgb24"),
+                "-f", "rawvideo", "-pix_fmt", "rgb24", "pipe:1"]
+        self.proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        self.done = False
+
+    def readinto(self, frame):
+        """Fills frame (uint8, contiguous). Returns False once the source is exhausted (frame keeps its last picture)."""
+        if self.done: return False
+        view = memoryview(frame).cast('B')
+        got = 0
+        while got < len(view):
+            n = self.proc.stdout.readinto(view[got:])
+            if not n:
+                self.close()
+                return False
+            got += n
+        return True
+
+    def close(self):
+        if self.done: return
+        self.done = True
+        try:
+            self.proc.stdout.close()
+            self.proc.kill()
+            self.proc.wait()
+        except Exception: pass
+
+# --- THE STREAM ---
+class StreamCompositor:
+    """
+    Whole video through one long-lived encoder: each source frame is read into a preallocated
+    buffer, active overlays are blended over their own rectangles (RegionCompositor) and the
+    frame is written to the encoder's stdin. No per-scene writers, no intermediate scene files.
+    """
+
+    def __init__(self, output_path, target_size, fps=24):
+        self.output_path = output_path
+        self.target_size = target_size
+        self.fps = fps
+        target_w, target_h = target_size
+        self.source = np.zeros((target_h, target_w, 3), dtype=np.uint8)
+        self.encoder = ffmpeg_engine.open_frame_encoder(output_path, target_size, fps)
+        self.frames_written = 0
+        self.elapsed = 0.0
+        self.damage = new_damage_stats()
+
+    def frames_for(self, duration):
+        """Whole frames for the next segment (cumulative rounding keeps picture and soundtrack in sync)."""
+        self.elapsed += duration
+        return max(1, int(round(self.elapsed * self.fps)) - self.frames_written)
+
+    def add_scene(self, visual, frames, overlays=(), is_image=False, frame_source=None):
+        """
+        Streams frames of a scene. frame_source(t, frame) may fill the buffer instead of FFmpeg
+        (e.g. a Ken Burns still); otherwise the visual is decoded by a FrameReader.
+        """
+        duration = frames / float(self.fps)
+        reader = None if frame_source else FrameReader(visual, self.target_size, self.fps, duration + 1.0 / self.fps, is_image)
+        regions = RegionCompositor(overlays)
+        try:
+            for f in range(frames):
+                t = f / float(self.fps)
+                if frame_source: frame_source(t, self.source)
+                else: reader.readinto(self.source) # Short source: the last picture is held
+                frame = regions.apply(self.source, t) # Source itself when nothing is on screen
+                self.encoder.stdin.write(frame.data)
+                self.frames_written += 1
+        finally:
+            if reader: reader.close()
+            merge_damage_stats(self.damage, regions.stats)
+
+    def add_clip(self, path):
+        """Appends a clip as-is (e.g. the cached outro). Returns its length in whole frames."""
+        info = ffmpeg_engine.probe_media(path)
+        frames = int((info['duration'] or 0) * self.fps)
+        if frames <= 0: return 0
+        self.elapsed += frames / float(self.fps)
+        self.add_scene(path, frames)
+        return frames
+
+    def close(self):
+        """Finishes the encode. Returns True if the video was written."""
+        return ffmpeg_engine.close_frame_encoder(self.encoder, label="Compositor") and self.frames_written > 0
@@ -10,18 +10,18 @@ from PIL import Image, ImageDraw, ImageFont
 # Suppress Warnings
 warnings.simplefilter(action='ignore', category=FutureWarning)
 
-from moviepy.editor import VideoFileClip, AudioFileClip, TextClip
+from moviepy.editor import VideoFileClip, AudioFileClip
 from moviepy.video.fx.all import mask_color
 from moviepy.audio.fx.all import volumex
-from moviepy.config import change_settings
 
 # --- NEW AI LIBRARY ---
 from google import genai
 import config 
 
+import caption_engine
+
 # --- SETUP ---
-if os.path.exists(config.IMAGEMAGICK_PATH):
-    change_settings({"IMAGEMAGICK_BINARY": config.IMAGEMAGICK_PATH})
+caption_engine.get_backend() # Configures ImageMagick from config.IMAGEMAGICK_PATH if installed
 
 if not hasattr(Image, 'ANTIALIAS'): Image.ANTIALIAS = Image.LANCZOS
 
@@ -55,13 +55,13 @@ def create_watermark(duration):
             position = ('right', 'bottom') 
             fontsize = 30 # Smaller for long form
             
-        watermark = TextClip(
+        watermark = caption_engine.to_image_clip(caption_engine.render_text(
             config.CHANNEL_NAME, 
-            fontsize=fontsize, 
+            font_size=fontsize, 
             color='white', 
             font='Arial', 
             bg_color='black'
-        )
+        ))
         
         # Add some padding if horizontal
         if mode == "Long":
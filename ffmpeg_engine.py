@@ -0,0 +1,625 @@
+# ffmpeg_engine.py (The Fast Editor)
+import hashlib
+import os
+import re
+import subprocess
+import imageio_ffmpeg
+import config
+import asset_cache
+
+# --- FFMPEG BINARY ---
+def get_ffmpeg_exe():
+    return imageio_ffmpeg.get_ffmpeg_exe()
+
+def run_ffmpeg(args, label="FFmpeg"):
+    """Runs ffmpeg with the given arguments. Returns True on success, prints the tail of stderr on failure."""
+    cmd = [get_ffmpeg_exe(), "-y", "-hide_banner", "-loglevel", "error"] + args
+    try:
+        result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        if result.returncode != 0:
+            err = result.stderr.decode('utf-8', errors='ignore').strip().splitlines()
+            print(f"   [{label} Error] " + " | ".join(err[-3:]))
+            return False
+        return True
+    except Exception as e:
+        print(f"   [{label} Error] {e}")
+        return False
+
+# --- MEDIA PROBE (No ffprobe in imageio-ffmpeg, so parse 'ffmpeg -i') ---
+def probe_media(path):
+    """
+    Reads stream info from the 'ffmpeg -i' banner.
+    Returns dict: duration, has_video, has_audio, width, height, fps, tbn, vcodec, vprofile,
+    pix_fmt, acodec, sample_rate, channels, plus vconfig (digest of the H.264 avcC record,
+    see read_avc_config). Missing values are None.
+    """
+    info = {
+        'duration': None, 'has_video': False, 'has_audio': False,
+        'width': None, 'height': None, 'fps': None, 'tbn': None, 'vcodec': None, 'vprofile': None,
+        'pix_fmt': None, 'acodec': None, 'sample_rate': None, 'channels': None,
+        'vconfig': None,
+    }
+    if not os.path.exists(path): return info
+
+    try:
+        result = subprocess.run([get_ffmpeg_exe(), "-hide_banner", "-i", path], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        text = result.stderr.decode('utf-8', errors='ignore')
+    except Exception:
+        return info
+
+    m = re.search(r"Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)", text)
+    if m:
+        info['duration'] = int(m.group(1)) * 3600 + int(m.group(2)) * 60 + float(m.group(3))
+
+    for line in text.splitlines():
+        line = line.strip()
+        if not line.startswith("Stream #"): continue
+
+        if "Video:" in line and not info['has_video']:
+            info['has_video'] = True
+            desc = line.split("Video:", 1)[1].strip()
+            info['vcodec'] = desc.split()[0].strip(',')
+            m = re.match(r"\w+ \(([^)/]+)\)", desc)
+            if m: info['vprofile'] = m.group(1)
+            m = re.search(r"\b(yuv\w+|rgb\w+|bgr\w+|gray\w*|nv12)\b", desc)
+            if m: info['pix_fmt'] = m.group(1)
+            m = re.search(r"\b(\d{2,5})x(\d{2,5})\b", desc)
+            if m: info['width'], info['height'] = int(m.group(1)), int(m.group(2))
+            m = re.search(r"([\d.]+)\s*fps", desc)
+            if m: info['fps'] = float(m.group(1))
+            m = re.search(r"(\d+(?:\.\d+)?k?) tbn", desc)
+            if m: info['tbn'] = m.group(1)
+
+        elif "Audio:" in line and not info['has_audio']:
+            info['has_audio'] = True
+            desc = line.split("Audio:", 1)[1].strip()
+            info['acodec'] = desc.split()[0].strip(',')
+            m = re.search(r"(\d+)\s*Hz", desc)
+            if m: info['sample_rate'] = int(m.group(1))
+            if "stereo" in desc: info['channels'] = 2
+            elif "mono" in desc: info['channels'] = 1
+            else:
+                m = re.search(r"(\d+)\s*channels", desc)
+                if m: info['channels'] = int(m.group(1))
+    if info['vcodec'] == 'h264':
+        avcc = read_avc_config(path)
+        if avcc: info['vconfig'] = hashlib.sha1(avcc).hexdigest()[:16]
+    return info
+
+# --- MP4 BOXES (Just enough of ISO BMFF to reach the codec config) ---
+MP4_CONTAINERS = (b'moov', b'trak', b'mdia', b'minf', b'stbl')
+
+def iter_boxes(f, start, end):
+    """(type, body_start, box_end) for each box in [start, end). Stops at a malformed header."""
+    pos = start
+    while pos + 8 <= end:
+        f.seek(pos)
+        head = f.read(8)
+        if len(head) < 8: return
+        size, kind, header = int.from_bytes(head[:4], 'big'), head[4:], 8
+        if size == 1:
+            size, header = int.from_bytes(f.read(8), 'big'), 16
+        elif size == 0:
+            size = end - pos # Last box runs to the end
+        if size < header or pos + size > end: return
+        yield kind, pos + header, pos + size
+        pos += size
+
+def read_avc_config(path):
+    """
+    avcC payload (profile, level, SPS/PPS) of the first H.264 track, found by walking
+    moov/trak/mdia/minf/stbl/stsd/avc1 (wherever moov sits; mdat is skipped, never scanned). None if absent.
+    """
+    def find(f, start, end):
+        for kind, body, stop in iter_boxes(f, start, end):
+            if kind in MP4_CONTAINERS:
+                found = find(f, body, stop)
+                if found: return found
+            elif kind == b'stsd':
+                # Full box header (4) + entry count (4), then sample entries
+                for entry, entry_body, entry_stop in iter_boxes(f, body + 8, stop):
+                    if entry not in (b'avc1', b'avc3'): continue
+                    # Visual sample entry fields take 78 bytes before the child boxes
+                    for child, child_body, child_stop in iter_boxes(f, entry_body + 78, entry_stop):
+                        if child == b'avcC':
+                            f.seek(child_body)
+                            return f.read(child_stop - child_body)
+        return None
+
+    try:
+        with open(path, 'rb') as f:
+            return find(f, 0, os.path.getsize(path))
+    except Exception:
+        return None
+
+def measure_loudness(path):
+    """Mean / peak volume (dB) of a file's audio via the volumedetect filter. Missing values are None."""
+    result = {'mean_db': None, 'max_db': None}
+    try:
+        cmd = [get_ffmpeg_exe(), "-hide_banner", "-nostats", "-i", path, "-vn", "-sn", "-dn", "-af", "volumedetect", "-f", "null", "-"]
+        text = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE).stderr.decode('utf-8', errors='ignore')
+    except Exception:
+        return result
+    m = re.search(r"mean_volume:\s*(-?[\d.]+|-inf) dB", text)
+    if m and m.group(1) != "-inf": result['mean_db'] = float(m.group(1))
+    m = re.search(r"max_volume:\s*(-?[\d.]+|-inf) dB", text)
+    if m and m.group(1) != "-inf": result['max_db'] = float(m.group(1))
+    return result
+
+# --- FILTERGRAPH HELPERS ---
+def concat_path(path):
+    """Formats a path for an FFmpeg concat list ('file ...' line)."""
+    return os.path.abspath(path).replace('\\', '/').replace("'", "'\\''")
+
+def fit_filter(target_w, target_h, fps):
+    """Scale-to-fill + centre crop, identical geometry to process_single_scene."""
+    return (f"scale={target_w}:{target_h}:force_original_aspect_ratio=increase,"
+            f"crop={target_w}:{target_h},setsar=1,fps={fps},format=yuv420p")
+
+# --- FOOTAGE PROXY (Download-time normalisation) ---
+def normalize_clip(src, dst, target_size, fps=24, duration=None, loop=False):
+    """
+    Trims, scales and centre-crops a raw stock clip to the exact render geometry and fps
+    (video only). The renderer then reads frames that need no per-frame resize/crop.
+    loop=True repeats a short clip until it reaches duration.
+    Returns True on success.
+    """
+    target_w, target_h = target_size
+    args = ["-stream_loop", "-1"] if loop and duration else []
+    args += ["-t", f"{duration:.3f}"] if duration else []
+    args += ["-i", src, "-an", "-vf", fit_filter(target_w, target_h, fps),
+             "-c:v", "libx264", "-preset", "ultrafast", "-crf", "18", "-pix_fmt", "yuv420p",
+             "-movflags", "+faststart", dst]
+    return run_ffmpeg(args, label="Proxy")
+
+# --- PARTIAL FETCH (Only the seconds a scene needs) ---
+def fetch_clip(url, dst, duration, timeout=30):
+    """
+    Stream-copies the first duration seconds of a remote clip's video straight from its URL
+    (FFmpeg reads over HTTP with range requests, so the rest is never downloaded).
+    A read stalled for timeout seconds aborts the fetch. Returns True on success.
+    """
+    args = ["-rw_timeout", str(int(timeout * 1000000)), "-t", f"{duration:.3f}", "-i", url, "-map", "0:v:0", "-c", "copy", "-an", "-movflags", "+faststart", dst]
+    return run_ffmpeg(args, label="Fetch")
+
+# --- DECODED FRAMES (Raw RGB24 on disk, for the frame cache) ---
+def decode_frames(src, dst, target_size, fps=24, duration=None):
+    """
+    Decodes a clip once to raw RGB24 frames of target_size at fps (same scale/crop as the
+    renderer), written back to back into dst with no header. Returns True on success.
+    """
+    target_w, target_h = target_size
+    args = ["-t", f"{duration:.3f}"] if duration else []
+    args += ["-i", src, "-an", "-vf", fit_filter(target_w, target_h, fps).replace("format=yuv420p", "format=rgb24"),
+             "-f", "rawvideo", "-pix_fmt", "rgb24", dst]
+    return run_ffmpeg(args, label="Frame Cache")
+
+# --- OUTRO SEGMENT ---
+def render_outro(src, dst, target_size, fps=24, with_audio=True):
+    """
+    Outro in the scene writer's stream format (libx264 ultrafast yuv420p, AAC 44.1 kHz stereo),
+    so it joins the scenes with '-c copy'. A source without audio gets silence. Returns True on success.
+    """
+    target_w, target_h = target_size
+    info = probe_media(src)
+    args = ["-i", src]
+    if with_audio and not info['has_audio']:
+        args += ["-f", "lavfi", "-t", f"{info['duration'] or 1:.3f}", "-i", "anullsrc=r=44100:cl=stereo"]
+        audio_map = ["-map", "1:a:0"]
+    elif with_audio:
+        audio_map = ["-map", "0:a:0"]
+    else:
+        audio_map = []
+
+    args += ["-map", "0:v:0"] + audio_map
+    args += ["-vf", fit_filter(target_w, target_h, fps), "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p", "-r", str(fps)]
+    args += ["-af", "apad", "-c:a", "aac", "-ar", "44100", "-ac", "2"] if with_audio else ["-an"]
+    if info['duration']: args += ["-t", f"{info['duration']:.3f}"] # Audio padded / cut to the picture
+    args += ["-movflags", "+faststart", dst]
+    return run_ffmpeg(args, label="Outro")
+
+# --- RAW FRAME ENCODER (Frames piped from Python) ---
+def open_frame_encoder(output_path, target_size, fps=24):
+    """
+    Starts a long-lived libx264 encoder that reads raw RGB24 frames of target_size on stdin
+    (video only). Write frame.tobytes() to .stdin, then close_frame_encoder(). Returns the Popen.
+    """
+    target_w, target_h = target_size
+    preset = getattr(config, 'FFMPEG_PRESET', 'ultrafast')
+    crf = str(getattr(config, 'FFMPEG_CRF', 20))
+    cmd = [get_ffmpeg_exe(), "-y", "-hide_banner", "-loglevel", "error",
+           "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{target_w}x{target_h}", "-r", str(fps), "-i", "pipe:0",
+           "-an", "-c:v", "libx264", "-preset", preset, "-crf", crf, "-pix_fmt", "yuv420p",
+           "-movflags", "+faststart", output_path]
+    return subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+def close_frame_encoder(proc, label="Encoder"):
+    """Flushes stdin and waits for the encoder. Returns True if it exited cleanly."""
+    try:
+        proc.stdin.close()
+    except Exception: pass
+    err = proc.stderr.read().decode('utf-8', errors='ignore') if proc.stderr else ""
+    proc.wait()
+    if proc.returncode != 0:
+        print(f"   [{label} Error] " + " | ".join(err.strip().splitlines()[-3:]))
+        return False
+    return True
+
+STEREO = "aresample=44100,aformat=sample_fmts=fltp:channel_layouts=stereo"
+
+# --- STREAM-COPY STITCHER ---
+def stream_signature(info):
+    """
+    Everything that must match for two MP4 segments to be joined with '-c copy': stream format
+    and codec config (profile, level, SPS/PPS). Encoder tuning that leaves the SPS/PPS alone
+    (e.g. -tune stillimage) does not force a re-encode.
+    """
+    return (
+        info['vcodec'], info['vprofile'], info['vconfig'],
+        info['width'], info['height'], info['fps'], info['tbn'], info['pix_fmt'],
+        info['has_audio'], info['acodec'], info['sample_rate'], info['channels'],
+    )
+
+def conform_segment(src, dst, ref):
+    """Re-encodes one segment to the reference stream parameters (same encoder settings as the scene writer)."""
+    info = probe_media(src)
+    args = ["-i", src]
+    if ref['has_audio'] and not info['has_audio']:
+        # Segment has no audio track: pair it with silence so the concat stays aligned
+        args += ["-f", "lavfi", "-t", f"{info['duration'] or 1:.3f}", "-i", f"anullsrc=r={ref['sample_rate'] or 44100}:cl=stereo"]
+        audio_map = ["-map", "1:a:0"]
+    elif ref['has_audio']:
+        audio_map = ["-map", "0:a:0"]
+    else:
+        audio_map = []
+
+    args += ["-map", "0:v:0"] + audio_map
+    args += [
+        "-vf", f"scale={ref['width']}:{ref['height']}:force_original_aspect_ratio=increase,crop={ref['width']}:{ref['height']},setsar=1",
+        "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", ref['pix_fmt'] or "yuv420p", "-r", f"{ref['fps'] or 24:g}",
+    ]
+    if ref['tbn'] and not ref['tbn'].endswith('k'):
+        args += ["-video_track_timescale", ref['tbn']]
+    if ref['has_audio']:
+        args += ["-c:a", "aac", "-ar", str(ref['sample_rate'] or 44100), "-ac", str(ref['channels'] or 2), "-shortest"]
+    args.append(dst)
+    return run_ffmpeg(args, label="Conform")
+
+def stitch_scenes(scene_files, output_path, list_file, work_dir=None):
+    """
+    Joins scene files with '-c copy'. Segments whose stream parameters differ from the
+    majority (typically the outro) are re-encoded to match first; everything else is
+    copied untouched. Conformed copies are written to work_dir (default: the list file's
+    folder, never next to a cached source) and deleted after the concat. Returns True on success.
+    """
+    from collections import Counter
+
+    if not scene_files: return False
+    infos = [probe_media(f) for f in scene_files]
+    if any(not i['has_video'] for i in infos): return False
+
+    sigs = [stream_signature(i) for i in infos]
+    ref_sig = Counter(sigs).most_common(1)[0][0]
+    ref = infos[sigs.index(ref_sig)]
+
+    work_dir = work_dir or os.path.dirname(list_file) or "."
+    stem = os.path.splitext(os.path.basename(list_file))[0]
+    segments = []
+    conformed = []
+    try:
+        for k, (path, sig) in enumerate(zip(scene_files, sigs)):
+            if sig == ref_sig:
+                segments.append(path)
+                continue
+            dst = os.path.join(work_dir, f"conform_{stem}_{k:03d}.mp4")
+            conformed.append(dst)
+            if not conform_segment(path, dst, ref): return False
+            if stream_signature(probe_media(dst)) != ref_sig:
+                print(f"   [Stitch] {os.path.basename(path)} still differs after re-encoding; not stream-copying.")
+                return False
+            segments.append(dst)
+
+        with open(list_file, 'w', encoding='utf-8') as f:
+            for vid in segments:
+                f.write(f"file '{concat_path(vid)}'\n")
+
+        print(f"   [Stitch] Stream-copying {len(segments)} segments ({len(conformed)} re-encoded to match)...")
+        return run_ffmpeg(["-f", "concat", "-safe", "0", "-i", list_file, "-c", "copy", "-movflags", "+faststart", output_path], label="Stitch")
+    finally:
+        for dst in conformed:
+            try:
+                if os.path.exists(dst): os.remove(dst)
+            except OSError: pass
+
+# --- AUDIO REMUX ---
+def mux_audio(video_path, audio_path, output_path):
+    """Replaces the soundtrack: copies the video stream untouched and encodes only the new audio."""
+    info = probe_media(video_path)
+    args = ["-i", video_path, "-i", audio_path, "-map", "0:v:0", "-map", "1:a:0",
+            "-c:v", "copy", "-c:a", "aac", "-b:a", "192k", "-ar", "44100", "-ac", "2"]
+    if info['duration']: args += ["-t", f"{info['duration']:.3f}"]
+    args += ["-movflags", "+faststart", output_path]
+    return run_ffmpeg(args, label="Mux")
+
+# --- OVERLAY TRACK (Captions + Emojis pre-composited into one RGBA stream) ---
+def build_overlay_track(scenes, target_size, rasterize_caption, work_dir, tag):
+    """
+    Pre-composites every caption/emoji state into full-canvas RGBA PNGs and writes a
+    concat list with per-image durations. The whole video then needs ONE overlay input
+    instead of one input per caption (drawtext is not available in every FFmpeg build).
+    rasterize_caption(chunk) -> PIL RGBA image of the caption.
+    Returns the concat list path, or None if there is nothing to overlay.
+    """
+    from PIL import Image
+
+    target_w, target_h = target_size
+    is_shorts = target_w < target_h
+    emoji_w = int(target_w * (0.18 if is_shorts else 0.12))
+
+    track_dir = os.path.join(work_dir, f"overlay_{tag}")
+    if not os.path.exists(track_dir): os.makedirs(track_dir)
+
+    blank_path = os.path.join(track_dir, "blank.png")
+    Image.new("RGBA", (target_w, target_h), (0, 0, 0, 0)).save(blank_path, compress_level=1)
+
+    sprite_cache = {}
+    def get_emoji(path):
+        if path not in sprite_cache:
+            sprite = asset_cache.SPRITES.get(path, emoji_w)
+            sprite_cache[path] = Image.fromarray(sprite['rgba'], 'RGBA') if sprite else None
+        return sprite_cache[path]
+
+    caption_cache = {}
+    def get_caption(index, chunk):
+        if index not in caption_cache:
+            caption_cache[index] = rasterize_caption(chunk)
+        return caption_cache[index]
+
+    entries = []     # (png_path, duration)
+    state_files = {} # active-set key -> png (identical states are written once)
+    has_content = False
+
+    for s_idx, scene in enumerate(scenes):
+        dur = scene['duration']
+        items = []
+        for c_idx, chunk in enumerate(scene['captions']):
+            if chunk['start'] < dur:
+                items.append(('cap', (s_idx, c_idx), chunk['start'], min(dur, chunk['start'] + chunk['duration']), chunk))
+        for emoji in scene['emojis']:
+            if emoji['start'] < dur:
+                items.append(('emoji', emoji['path'], emoji['start'], min(dur, emoji['start'] + emoji['duration']), emoji))
+
+        bounds = sorted(set([0.0, dur] + [it[2] for it in items] + [it[3] for it in items]))
+        for a, b in zip(bounds[:-1], bounds[1:]):
+            if b - a <= 0: continue
+            active = [it for it in items if it[2] <= a < it[3]]
+            if not active:
+                entries.append((blank_path, b - a))
+                continue
+
+            key = tuple((it[0], it[1]) for it in active)
+            if key not in state_files:
+                canvas = Image.new("RGBA", (target_w, target_h), (0, 0, 0, 0))
+                for kind, ident, _, _, data in active:
+                    if kind == 'emoji':
+                        sprite = get_emoji(ident)
+                        if sprite is None: continue
+                        if is_shorts:
+                            pos = ((target_w - sprite.width) // 2, int(target_h / 2 - sprite.height - 50))
+                        else:
+                            pos = (int(target_w * 0.75), (target_h - sprite.height) // 2)
+                    else:
+                        sprite = get_caption(ident, data)
+                        if sprite is None: continue
+                        if is_shorts:
+                            pos = ((target_w - sprite.width) // 2, (target_h - sprite.height) // 2)
+                        else:
+                            pos = ((target_w - sprite.width) // 2, target_h - sprite.height - 50)
+                    canvas.alpha_composite(sprite, dest=(max(0, pos[0]), max(0, pos[1])))
+                png = os.path.join(track_dir, f"state_{len(state_files):05d}.png")
+                canvas.save(png, compress_level=1)
+                state_files[key] = png
+            entries.append((state_files[key], b - a))
+            has_content = True
+
+    if not has_content: return None
+
+    list_path = os.path.join(track_dir, "overlay_list.txt")
+    with open(list_path, 'w', encoding='utf-8') as f:
+        for png, d in entries:
+            f.write(f"file '{concat_path(png)}'\nduration {d:.4f}\n")
+        # Concat demuxer ignores the last duration unless the file is repeated
+        f.write(f"file '{concat_path(blank_path)}'\n")
+    return list_path
+
+# --- SINGLE-PASS RENDERER ---
+def render_picture_part(scenes, output_path, target_size, rasterize_caption, fps=24, outro_path=None,
+                        work_dir="temp", tag="render"):
+    """
+    Video-only encode of consecutive scenes (+ the outro on the last part): visuals looped to
+    their narration length, concatenated, with their slice of the caption/emoji track on top.
+    Returns (ok, seconds of picture).
+    """
+    target_w, target_h = target_size
+    inputs = []
+    graph = []
+
+    def add_input(args):
+        inputs.append(args)
+        return len(inputs) - 1
+
+    pads = []
+    for i, scene in enumerate(scenes):
+        dur = scene['duration']
+        if scene['is_image']:
+            v_in = add_input(["-loop", "1", "-framerate", str(fps), "-t", f"{dur:.3f}", "-i", scene['visual']])
+        else:
+            v_in = add_input(["-stream_loop", "-1", "-t", f"{dur:.3f}", "-i", scene['visual']])
+        graph.append(f"[{v_in}:v]{fit_filter(target_w, target_h, fps)},trim=duration={dur:.3f},setpts=PTS-STARTPTS[vs{i}]")
+        pads.append(f"[vs{i}]")
+    total = sum(s['duration'] for s in scenes)
+
+    if outro_path:
+        o_in = add_input(["-i", outro_path])
+        graph.append(f"[{o_in}:v]{fit_filter(target_w, target_h, fps)},setpts=PTS-STARTPTS[vo]")
+        pads.append("[vo]")
+        total += probe_media(outro_path)['duration'] or 0
+
+    graph.append("".join(pads) + f"concat=n={len(pads)}:v=1:a=0[vcat]")
+
+    overlay_list = build_overlay_track(scenes, target_size, rasterize_caption, work_dir, tag)
+    if overlay_list:
+        ov_in = add_input(["-f", "concat", "-safe", "0", "-i", overlay_list])
+        graph.append(f"[{ov_in}:v]fps={fps},format=rgba,setpts=PTS-STARTPTS[ov]")
+        graph.append(f"[vcat][ov]overlay=x=0:y=0:eof_action=pass:format=auto,format=yuv420p[vout]")
+    else:
+        graph.append("[vcat]null[vout]")
+
+    # Script file avoids Windows command-line length limits
+    script_path = os.path.join(work_dir, f"filtergraph_{tag}.txt")
+    with open(script_path, 'w', encoding='utf-8') as f:
+        f.write(";\n".join(graph))
+
+    preset = getattr(config, 'FFMPEG_PRESET', 'ultrafast')
+    crf = str(getattr(config, 'FFMPEG_CRF', 20))
+    args = [a for input_spec in inputs for a in input_spec] + [
+        "-filter_complex_script", script_path, "-map", "[vout]", "-an",
+        "-c:v", "libx264", "-preset", preset, "-crf", crf, "-pix_fmt", "yuv420p", "-r", str(fps),
+        "-t", f"{total:.3f}", output_path
+    ]
+    ok = run_ffmpeg(args, label="FFmpeg Engine")
+
+    try:
+        os.remove(script_path)
+        if overlay_list:
+            import shutil
+            shutil.rmtree(os.path.dirname(overlay_list), ignore_errors=True)
+    except: pass
+    return ok and os.path.exists(output_path), total
+
+def render_timeline(scenes, output_path, target_size, rasterize_caption, fps=24, narration_path=None, music_path=None,
+                    music_volume=None, chime_path=None, outro_path=None, work_dir="temp", tag="render"):
+    """
+    Encodes the whole video once, with a bounded number of FFmpeg inputs per process.
+    scenes: list of dicts from media_engine.plan_render_scene()
+        {visual, is_image, audio, duration, captions, emojis, sfx}
+    Picture: scenes are cut into parts of at most FFMPEG_GRAPH_INPUTS visuals, each part is one
+    graph + one encode (render_picture_part), and the parts are joined by the concat demuxer
+    (stream copy: same encoder, same settings).
+    Sound: narration arrives as ONE track (narration_path: every scene's narration padded /
+    trimmed to its scene, back to back), each distinct SFX asset is ONE input fanned out with
+    asplit + adelay, then outro audio, music (MUSIC_VOLUME) and windchime.
+    Returns output_path or None.
+    """
+    if not scenes or not narration_path or not os.path.exists(narration_path): return None
+    if music_volume is None: music_volume = float(getattr(config, 'MUSIC_VOLUME', 0.30))
+
+    outro_info = None
+    if outro_path and os.path.exists(outro_path):
+        outro_info = probe_media(outro_path)
+        if not (outro_info['has_video'] and outro_info['duration']): outro_info = None
+
+    # 1. PICTURE (Parts of at most FFMPEG_GRAPH_INPUTS visuals)
+    per_part = max(1, int(getattr(config, 'FFMPEG_GRAPH_INPUTS', 24)))
+    groups = [scenes[k:k + per_part] for k in range(0, len(scenes), per_part)]
+    parts = []
+    print(f"   [FFmpeg Engine] Rendering {len(scenes)} scenes in {len(groups)} part(s) of <= {per_part} visuals...")
+    for k, group in enumerate(groups):
+        part_path = os.path.join(work_dir, f"part_{tag}_{k:03d}.mp4")
+        is_last = k == len(groups) - 1
+        ok, _ = render_picture_part(group, part_path, target_size, rasterize_caption, fps,
+                                    outro_path=outro_path if (is_last and outro_info) else None,
+                                    work_dir=work_dir, tag=f"{tag}_{k:03d}")
+        parts.append(part_path)
+        if not ok:
+            for p in parts:
+                try:
+                    if os.path.exists(p): os.remove(p)
+                except OSError: pass
+            return None
+
+    list_file = os.path.join(work_dir, f"parts_{tag}.txt")
+    with open(list_file, 'w', encoding='utf-8') as f:
+        for p in parts: f.write(f"file '{concat_path(p)}'\n")
+
+    # 2. SOUND (One narration track, one input per distinct SFX asset)
+    scenes_total = sum(s['duration'] for s in scenes)
+    total = scenes_total + (outro_info['duration'] if outro_info else 0.0)
+    inputs = [["-f", "concat", "-safe", "0", "-i", list_file], ["-i", narration_path]]
+    graph = [f"[1:a]{STEREO},apad,atrim=end={scenes_total:.3f},asetpts=PTS-STARTPTS[nar]"]
+
+    def add_input(args):
+        inputs.append(args)
+        return len(inputs) - 1
+
+    occurrences = {} # sfx path -> [(absolute start, length, volume)]
+    offset = 0.0
+    for scene in scenes:
+        for sfx in scene['sfx']:
+            remain = scene['duration'] - sfx['start']
+            if remain < 0.05: continue
+            occurrences.setdefault(sfx['path'], []).append((offset + sfx['start'], remain, sfx['volume']))
+        offset += scene['duration']
+
+    voice = ["[nar]"]
+    for n, (path, uses) in enumerate(occurrences.items()):
+        s_in = add_input(["-i", path])
+        labels = [f"[x{n}_{j}]" for j in range(len(uses))]
+        graph.append(f"[{s_in}:a]{STEREO},asplit={len(uses)}" + "".join(labels) if len(uses) > 1
+                     else f"[{s_in}:a]{STEREO}{labels[0]}")
+        for j, (start, remain, volume) in enumerate(uses):
+            delay = int(start * 1000)
+            graph.append(f"{labels[j]}atrim=end={remain:.3f},volume={volume},adelay={delay}|{delay}[sfx{n}_{j}]")
+            voice.append(f"[sfx{n}_{j}]")
+    if len(voice) > 1:
+        graph.append("".join(voice) + f"amix=inputs={len(voice)}:duration=first:dropout_transition=0:normalize=0[voice]")
+    else:
+        graph.append("[nar]anull[voice]")
+
+    if outro_info:
+        o_in = add_input(["-i", outro_path])
+        o_dur = outro_info['duration']
+        if outro_info['has_audio']:
+            graph.append(f"[{o_in}:a]{STEREO},apad,atrim=end={o_dur:.3f},asetpts=PTS-STARTPTS[ao]")
+        else:
+            graph.append(f"anullsrc=r=44100:cl=stereo,atrim=end={o_dur:.3f}[ao]")
+        graph.append("[voice][ao]concat=n=2:v=0:a=1[acat]")
+    else:
+        graph.append("[voice]anull[acat]")
+
+    final_mix = ["[acat]"]
+    if music_path and os.path.exists(music_path):
+        m_in = add_input(["-i", music_path])
+        graph.append(f"[{m_in}:a]{STEREO},atrim=end={total:.3f},volume={music_volume}[mus]")
+        final_mix.append("[mus]")
+    if chime_path and os.path.exists(chime_path):
+        c_in = add_input(["-i", chime_path])
+        graph.append(f"[{c_in}:a]{STEREO},volume=0.6,adelay=500|500[chime]")
+        final_mix.append("[chime]")
+    if len(final_mix) > 1:
+        graph.append("".join(final_mix) + f"amix=inputs={len(final_mix)}:duration=first:dropout_transition=0:normalize=0[aout]")
+    else:
+        graph.append("[acat]anull[aout]")
+
+    script_path = os.path.join(work_dir, f"filtergraph_{tag}_audio.txt")
+    with open(script_path, 'w', encoding='utf-8') as f:
+        f.write(";\n".join(graph))
+
+    # 3. JOIN (Picture stream-copied, sound encoded once)
+    args = [a for input_spec in inputs for a in input_spec] + [
+        "-filter_complex_script", script_path,
+        "-map", "0:v:0", "-map", "[aout]", "-c:v", "copy",
+        "-c:a", "aac", "-b:a", "192k", "-ar", "44100", "-ac", "2",
+        "-t", f"{total:.3f}", "-movflags", "+faststart",
+        output_path
+    ]
+    print(f"   [FFmpeg Engine] Joining {len(parts)} part(s) with the soundtrack ({len(inputs)} inputs, {total:.1f}s)...")
+    ok = run_ffmpeg(args, label="FFmpeg Engine")
+
+    for p in parts + [list_file, script_path]:
+        try:
+            if os.path.exists(p): os.remove(p)
+        except OSError: pass
+
+    if ok and os.path.exists(output_path): return output_path
+    return None
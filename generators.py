@@ -556,6 +556,54 @@ def extract_visual_keyword_python(sentence):
     # Return the LONGEST word (usually most specific)
     return max(meaningful_words, key=len)
 
+# --- SCENE COALESCING (Long-form: one render unit per visual change, not per sentence) ---
+VISUAL_STOPWORDS = {"the", "a", "an", "of", "and", "in", "on", "at", "with", "for", "to", "by", "from", "into",
+                    "close", "up", "shot", "footage", "cinematic", "view", "scene", "background"}
+
+def visual_terms(visual):
+    """Content words of a visual search term ('[AI]' tag, filler words and plural 's' dropped)."""
+    clean = re.sub(r'[^\w\s]', ' ', visual.lower().replace("[ai]", ""))
+    return {w[:-1] if len(w) > 3 and w.endswith('s') else w for w in clean.split() if w not in VISUAL_STOPWORDS}
+
+def estimate_narration(text, words_per_second=None):
+    """Rough TTS length of text in seconds (the real length is only known after TTS)."""
+    wps = words_per_second or float(getattr(config, 'NARRATION_WORDS_PER_SECOND', 2.6))
+    return len(text.split()) / wps
+
+def coalesce_timeline(timeline, target_duration=None, similarity=None):
+    """
+    Merges runs of adjacent scenes whose visuals share (or nearly share) their terms into one
+    render unit of at most target_duration seconds of estimated narration. Terms match when
+    their overlap / union reaches similarity, or one term's words contain the other's.
+    A merged scene keeps the first visual and the sentences joined in order, so its TTS, word
+    timings and captions cover every sentence as before; only the number of searches,
+    downloads, TTS calls and render segments drops.
+    """
+    if not timeline: return timeline
+    target = float(target_duration or getattr(config, 'SCENE_TARGET_SECONDS', 15))
+    threshold = float(similarity if similarity is not None else getattr(config, 'SCENE_COALESCE_SIMILARITY', 0.5))
+
+    merged = [dict(timeline[0])]
+    terms = visual_terms(timeline[0]['visual'])
+    for scene in timeline[1:]:
+        current = merged[-1]
+        next_terms = visual_terms(scene['visual'])
+        combined = current['text'] + " " + scene['text']
+        # Visuals that reduce to nothing (all filler, e.g. "cinematic shot") never match anything
+        similar = False
+        if terms and next_terms:
+            overlap = len(terms & next_terms) / len(terms | next_terms)
+            similar = overlap >= threshold or terms <= next_terms or next_terms <= terms
+        if similar and estimate_narration(combined) <= target:
+            current['text'] = combined
+            continue
+        merged.append(dict(scene))
+        terms = next_terms
+
+    if len(merged) < len(timeline):
+        print(f"   [Coalesce] {len(timeline)} sentences -> {len(merged)} scenes (shared visuals, <= {target:.0f}s each).")
+    return merged
+
 # --- TIMELINE GENERATOR (STOCK VIDEO ONLY) ---
 def generate_timeline_batched(topic, script):
     print("   [System] Generating Timeline (Stock Footage Mode)...")
@@ -606,6 +654,11 @@ def generate_timeline_batched(topic, script):
             # Clean any accidental "AI:" tags just in case
             clean_visual = visual.replace("AI:", "").strip()
             timeline.append({'text': text, 'visual': clean_visual})
+    
+    # Long-form: adjacent sentences on the same visual become one scene (Shorts keep their fast cuts)
+    mode = config.VIDEO_MODE if hasattr(config, 'VIDEO_MODE') else "Shorts"
+    if mode != "Shorts" and getattr(config, 'SCENE_COALESCE', True):
+        timeline = coalesce_timeline(timeline)
             
     print(f"   [Success] Timeline generated with {len(timeline)} scenes.")
     return timeline
@@ -668,10 +721,14 @@ def generate_scene_data(topic):
     return topic, timeline, tags
 
 # --- AUDIO ENGINE (WITH ELASTIC SYNC) ---
-async def generate_segmented_audio(timeline, session_id):
-    """Generates TTS audio files for each scene in the timeline."""
+async def generate_segmented_audio(timeline, session_id, journal=None):
+    """
+    Generates TTS audio files for each scene in the timeline.
+    journal: scenes already recorded (with intact files) are reused, and the session keeps one voice.
+    """
     print(f"2.5 Generating Audio & Timing for {len(timeline)} scenes...")
-    selected_voice = get_random_voice()
+    selected_voice = (journal.get('tts_voice') if journal else None) or get_random_voice()
+    if journal and not journal.get('tts_voice'): journal.record('tts_voice', selected_voice)
     audio_files = []
 
     # Ensure we have the tool to measure audio duration
@@ -683,6 +740,10 @@ async def generate_segmented_audio(timeline, session_id):
         filename = os.path.join(TEMP_DIR, f"audio_{i}_{session_id}.mp3")
         timing_filename = os.path.join(TEMP_DIR, f"timing_{i}_{session_id}.json")
         
+        if journal and journal.done(f"tts:{i}"):
+            audio_files.append(filename)
+            continue
+        
         # 1. SPEED SETTINGS
         if "hi-" in selected_voice:
             rate = "+30%" 
@@ -731,6 +792,7 @@ async def generate_segmented_audio(timeline, session_id):
                 
             if os.path.exists(filename): 
                 audio_files.append(filename)
+                if journal: journal.record(f"tts:{i}", {'text': clean_text}, [filename, timing_filename])
 
         except Exception as e: 
             print(f"   [Error] Audio gen failed for segment {i}: {e}")
@@ -810,7 +872,73 @@ def generate_ai_image(query, filename, mode):
 
  # In generators.py -> Replace the entire download_specific_scenes function
 
-def download_specific_scenes(timeline, session_id):
+def normalize_scene_clip(path, target_size, duration=None):
+    """Replaces a downloaded clip with its render-ready proxy (exact size, 24fps, trimmed). Keeps the raw file on failure."""
+    import ffmpeg_engine
+    proxy_path = path.replace(".mp4", "_proxy.mp4")
+    try:
+        if ffmpeg_engine.normalize_clip(path, proxy_path, target_size, fps=24, duration=duration):
+            os.replace(proxy_path, path)
+            return True
+    except Exception as e:
+        print(f"      [Proxy Warning] {os.path.basename(path)}: {e}")
+    try:
+        if os.path.exists(proxy_path): os.remove(proxy_path)
+    except: pass
+    return False
+
+def pick_stock_clip(candidates, need=None):
+    """
+    Stock clip for a scene once its narration length is known: one of the first few results
+    (relevance order) long enough to cover need seconds, else the longest (fewest loops).
+    candidates: search hits with 'duration'.
+    """
+    if not candidates: return None
+    if not need: return random.choice(candidates[:3])
+    covering = [c for c in candidates if c['duration'] >= need]
+    if covering: return random.choice(covering[:3])
+    return max(candidates, key=lambda c: c['duration'])
+
+def pick_rendition(renditions, target_size):
+    """
+    Smallest rendition that still fills target_size without upscaling (fewest bytes to fetch and
+    decode), else the largest one. renditions: dicts with 'width', 'height' and 'link'.
+    """
+    usable = [r for r in renditions if r.get('width') and r.get('height') and r.get('link')]
+    if not usable: return None
+    target_w, target_h = target_size
+    covering = [r for r in usable if r['width'] >= target_w and r['height'] >= target_h]
+    if covering: return min(covering, key=lambda r: r['width'] * r['height'])['link']
+    return max(usable, key=lambda r: r['width'] * r['height'])['link']
+
+def fetch_stock_clip(link, filename, need=None):
+    """
+    Saves a stock clip to filename. With need (seconds) and PARTIAL_DOWNLOADS, only the first
+    need seconds are fetched (FFmpeg stream copy from the URL); otherwise, or if that fails,
+    the whole file is downloaded. A connection stalled for DOWNLOAD_TIMEOUT seconds fails.
+    """
+    timeout = float(getattr(config, 'DOWNLOAD_TIMEOUT', 30))
+    if need and getattr(config, 'PARTIAL_DOWNLOADS', True):
+        import ffmpeg_engine
+        if ffmpeg_engine.fetch_clip(link, filename, need, timeout=timeout) and os.path.exists(filename) and os.path.getsize(filename) > 0:
+            return True
+        print("      [Fetch] Partial fetch failed, downloading the full clip.")
+    with requests.get(link, stream=True, timeout=timeout) as req, open(filename, 'wb') as f:
+        for chunk in req.iter_content(8192): f.write(chunk)
+    return True
+
+def download_specific_scenes(timeline, session_id, target_durations=None, journal=None):
+    """
+    Downloads one visual per scene.
+    target_durations: narration length per scene (known before the download). Clips that cover
+    it are preferred, the smallest rendition that fills the frame is used, and only the seconds
+    the scene needs (x PROXY_DURATION_MARGIN) are fetched, so the renderer does not loop footage
+    or decode frames it throws away.
+    journal: scenes whose download (and proxy) is already recorded with intact files are skipped.
+    NORMALIZE_FOOTAGE: each video is transcoded by FFmpeg (in the background, while the next scene
+    downloads) to the exact 1080x1920 / 1920x1080 target at 24fps, trimmed to the scene's narration
+    length x PROXY_DURATION_MARGIN (headroom for the longer Hindi narration).
+    """
     print(f"3. Downloading Media (Stock Mode Only)...")
     
     # Setup Config & Temp Dir
@@ -830,102 +958,143 @@ def download_specific_scenes(timeline, session_id):
         
     ai_generated_count = 0
 
-    for i, scene in enumerate(timeline):
-        raw_query = scene['visual']
+    # 1b. PROXY STAGE (Runs alongside the downloads)
+    normalize = getattr(config, 'NORMALIZE_FOOTAGE', True)
+    target_size = (1080, 1920) if mode == "Shorts" else (1920, 1080)
+    margin = getattr(config, 'PROXY_DURATION_MARGIN', 1.35)
+    proxy_pool = None
+    proxy_jobs = []
+    if normalize:
+        from concurrent.futures import ThreadPoolExecutor
+        proxy_pool = ThreadPoolExecutor(max_workers=max(1, int(getattr(config, 'PROXY_WORKERS', 2))))
+
+    # The proxy pool is always shut down; a failed download loop cancels the queued transcodes
+    completed = False
+    try:
+        for i, scene in enumerate(timeline):
+            if journal and journal.done(f"download:{i}"):
+                video_files.append(journal.get(f"download:{i}")['path'])
+                continue
+        
+            raw_query = scene['visual']
+            need = None
+            if target_durations and i < len(target_durations) and target_durations[i]:
+                need = target_durations[i] * margin + 0.5
         
-        # 2. DECIDE: AI OR STOCK?
-        # Clean the query immediately so we can use it for Stock search
-        clean_query = raw_query.replace("[AI]", "").replace("[ai]", "").replace("hyperrealistic", "").strip()
+            # 2. DECIDE: AI OR STOCK?
+            # Clean the query immediately so we can use it for Stock search
+            clean_query = raw_query.replace("[AI]", "").replace("[ai]", "").replace("hyperrealistic", "").strip()
         
-        filename = os.path.join(TEMP_DIR, f"clip_{i}_{session_id}.mp4") # Default video container
-        ai_filename = os.path.join(TEMP_DIR, f"clip_{i}_{session_id}.png") # AI Image container
-        found = False
-
-        # --- PATH A: AI GENERATION (DISABLED / COMMENTED OUT) ---
-        # use_ai = False
-        # if "[AI]" in raw_query.upper():
-        #     if ai_generated_count < ai_quota:
-        #         print(f"   [Scene {i+1}] 🤖 AI Tag detected... but AI Mode is DISABLED.")
-        #         # use_ai = True 
-        #     else:
-        #         print(f"   [Quota Limit] Max AI images ({ai_quota}) reached. Switching to Stock.")
+            filename = os.path.join(TEMP_DIR, f"clip_{i}_{session_id}.mp4") # Default video container
+            ai_filename = os.path.join(TEMP_DIR, f"clip_{i}_{session_id}.png") # AI Image container
+            found = False
+
+            # --- PATH A: AI GENERATION (DISABLED / COMMENTED OUT) ---
+            # use_ai = False
+            # if "[AI]" in raw_query.upper():
+            #     if ai_generated_count < ai_quota:
+            #         print(f"   [Scene {i+1}] 🤖 AI Tag detected... but AI Mode is DISABLED.")
+            #         # use_ai = True 
+            #     else:
+            #         print(f"   [Quota Limit] Max AI images ({ai_quota}) reached. Switching to Stock.")
         
-        # if use_ai:
-        #     print(f"   [Scene {i+1}] 🤖 Generating AI Art: '{clean_query}'")
-        #     ai_path = generate_ai_image(clean_query, ai_filename, mode)
-        #     if ai_path and os.path.exists(ai_path):
-        #         video_files.append(ai_path)
-        #         ai_generated_count += 1
-        #         found = True
-        #         print(f"      [Success] AI Image created. (Quota: {ai_generated_count}/{ai_quota})")
-        #     else:
-        #         print("      [Fallback] AI failed. Switching to Stock.")
-        # --------------------------------------------------------
-
-        # --- PATH B: STOCK FOOTAGE (Default) ---
-        if not found:
-            print(f"   [Scene {i+1}] 🎥 Searching Stock: '{clean_query}'")
+            # if use_ai:
+            #     print(f"   [Scene {i+1}] 🤖 Generating AI Art: '{clean_query}'")
+            #     ai_path = generate_ai_image(clean_query, ai_filename, mode)
+            #     if ai_path and os.path.exists(ai_path):
+            #         video_files.append(ai_path)
+            #         ai_generated_count += 1
+            #         found = True
+            #         print(f"      [Success] AI Image created. (Quota: {ai_generated_count}/{ai_quota})")
+            #     else:
+            #         print("      [Fallback] AI failed. Switching to Stock.")
+            # --------------------------------------------------------
+
+            # --- PATH B: STOCK FOOTAGE (Default) ---
+            if not found:
+                print(f"   [Scene {i+1}] 🎥 Searching Stock: '{clean_query}'")
             
-            # 1. PEXELS VIDEO
-            try:
-                r = requests.get(f"https://api.pexels.com/videos/search?query={clean_query}&per_page=15&orientation={orientation}", headers=headers, timeout=10).json()
-                valid = [v for v in r.get('videos', []) if v['duration'] >= 4]
+                # 1. PEXELS VIDEO
+                try:
+                    r = requests.get(f"https://api.pexels.com/videos/search?query={clean_query}&per_page=15&orientation={orientation}", headers=headers, timeout=10).json()
+                    valid = [v for v in r.get('videos', []) if v['duration'] >= 4]
                 
-                # Filter by aspect ratio to avoid bad crops
-                if mode == "Shorts": 
-                    valid = [v for v in valid if v['width'] <= v['height']]
-                else: 
-                    valid = [v for v in valid if v['height'] <= v['width']]
+                    # Filter by aspect ratio to avoid bad crops
+                    if mode == "Shorts": 
+                        valid = [v for v in valid if v['width'] <= v['height']]
+                    else: 
+                        valid = [v for v in valid if v['height'] <= v['width']]
                 
-                if valid:
-                    link = random.choice(valid[:3])['video_files'][0]['link']
-                    with requests.get(link, stream=True) as req, open(filename, 'wb') as f:
-                        for chunk in req.iter_content(8192): f.write(chunk)
-                    video_files.append(filename)
-                    found = True
-                    print("      [Success] Pexels Video found.")
-            except: pass
-
-            # 2. PIXABAY VIDEO (Backup)
-            if not found and hasattr(config, 'PIXABAY_API_KEY'):
-                try:
-                    ori = "vertical" if orientation == "portrait" else "horizontal"
-                    r = requests.get(f"https://pixabay.com/api/videos/?key={config.PIXABAY_API_KEY}&q={clean_query}&video_type=film&orientation={ori}", timeout=10).json()
-                    valid = [v for v in r.get('hits', []) if v['duration'] >= 4]
                     if valid:
-                        link = random.choice(valid[:3])['videos']['medium']['url']
-                        with requests.get(link, stream=True) as req, open(filename, 'wb') as f:
-                            for chunk in req.iter_content(8192): f.write(chunk)
+                        pick = pick_stock_clip(valid, need)
+                        link = pick_rendition(pick['video_files'], target_size) or pick['video_files'][0]['link']
+                        fetch_stock_clip(link, filename, need)
                         video_files.append(filename)
                         found = True
-                        print("      [Success] Pixabay Video found.")
+                        print("      [Success] Pexels Video found.")
                 except: pass
+
+                # 2. PIXABAY VIDEO (Backup)
+                if not found and hasattr(config, 'PIXABAY_API_KEY'):
+                    try:
+                        ori = "vertical" if orientation == "portrait" else "horizontal"
+                        r = requests.get(f"https://pixabay.com/api/videos/?key={config.PIXABAY_API_KEY}&q={clean_query}&video_type=film&orientation={ori}", timeout=10).json()
+                        valid = [v for v in r.get('hits', []) if v['duration'] >= 4]
+                        if valid:
+                            pick = pick_stock_clip(valid, need)
+                            renditions = [dict(v, link=v.get('url')) for v in pick['videos'].values()]
+                            link = pick_rendition(renditions, target_size) or pick['videos']['medium']['url']
+                            fetch_stock_clip(link, filename, need)
+                            video_files.append(filename)
+                            found = True
+                            print("      [Success] Pixabay Video found.")
+                    except: pass
             
-            # 3. PEXELS PHOTO (Final Safety Net)
-            if not found:
-                try:
-                    img_filename = os.path.join(TEMP_DIR, f"clip_{i}_{session_id}.jpg")
-                    r = requests.get(f"https://api.pexels.com/v1/search?query={clean_query}&per_page=1", headers=headers, timeout=10).json()
-                    if r.get('photos'):
-                        k = 'portrait' if orientation == 'portrait' else 'landscape'
-                        link = r['photos'][0]['src'][k]
-                        with requests.get(link, stream=True) as req, open(img_filename, 'wb') as f:
-                            for chunk in req.iter_content(8192): f.write(chunk)
-                        video_files.append(img_filename)
-                        found = True
-                        print("      [Success] Stock Photo found (Fallback).")
-                except: pass
+                # 3. PEXELS PHOTO (Final Safety Net)
+                if not found:
+                    try:
+                        img_filename = os.path.join(TEMP_DIR, f"clip_{i}_{session_id}.jpg")
+                        r = requests.get(f"https://api.pexels.com/v1/search?query={clean_query}&per_page=1", headers=headers, timeout=10).json()
+                        if r.get('photos'):
+                            k = 'portrait' if orientation == 'portrait' else 'landscape'
+                            link = r['photos'][0]['src'][k]
+                            with requests.get(link, stream=True) as req, open(img_filename, 'wb') as f:
+                                for chunk in req.iter_content(8192): f.write(chunk)
+                            video_files.append(img_filename)
+                            found = True
+                            print("      [Success] Stock Photo found (Fallback).")
+                    except: pass
         
-        # FINAL CHECK: Black Screen Failsafe
-        if not found:
-            print("      [Fail] No media found. Using Black Screen placeholder.")
-            from moviepy.editor import ColorClip
-            black_path = os.path.join(TEMP_DIR, f"clip_{i}_{session_id}.jpg")
-            # Create a 720x1280 (Shorts) or 1280x720 (Long) black image
-            w, h = (720, 1280) if mode == "Shorts" else (1280, 720)
-            ColorClip(size=(w, h), color=(0,0,0), duration=5).save_frame(black_path, t=1)
-            video_files.append(black_path)
-
-        time.sleep(1) # Polite delay
+            # FINAL CHECK: Black Screen Failsafe
+            if not found:
+                print("      [Fail] No media found. Using Black Screen placeholder.")
+                from moviepy.editor import ColorClip
+                black_path = os.path.join(TEMP_DIR, f"clip_{i}_{session_id}.jpg")
+                # Create a 720x1280 (Shorts) or 1280x720 (Long) black image
+                w, h = (720, 1280) if mode == "Shorts" else (1280, 720)
+                ColorClip(size=(w, h), color=(0,0,0), duration=5).save_frame(black_path, t=1)
+                video_files.append(black_path)
+
+            # Queue the proxy transcode (videos only; stills are handled by the renderer)
+            if proxy_pool and video_files and video_files[-1] == filename:
+                job = proxy_pool.submit(normalize_scene_clip, filename, target_size, need)
+                # Journal the clip once its proxy has replaced the raw file (checksum of the final bytes)
+                if journal:
+                    job.add_done_callback(lambda _job, i=i, path=filename: journal.record(f"download:{i}", {'path': path}, [path]))
+                proxy_jobs.append(job)
+            elif journal and video_files:
+                journal.record(f"download:{i}", {'path': video_files[-1]}, [video_files[-1]])
+
+            time.sleep(1) # Polite delay
+    
+        completed = True
+    finally:
+        if proxy_pool:
+            if completed:
+                done = sum(1 for job in proxy_jobs if job.result())
+                if proxy_jobs: print(f"   [Proxy] Normalised {done}/{len(proxy_jobs)} clips to {target_size[0]}x{target_size[1]} @ 24fps.")
+            else:
+                for job in proxy_jobs: job.cancel() # Queued transcodes never start
+            proxy_pool.shutdown(wait=True)
         
     return video_files
\ No newline at end of file
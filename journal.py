@@ -0,0 +1,99 @@
+# journal.py (The Logbook)
+import os
+import json
+import time
+import hashlib
+import threading
+
+# --- JOURNAL LOCATION ---
+# Lives in temp/ with the session's other files, so a finished session's journal is
+# cleaned up by studio.manage_session_files; a crashed one stays for resume.
+JOURNAL_DIR = "temp"
+
+def journal_path(session_id):
+    return os.path.join(JOURNAL_DIR, f"journal_{session_id}.jsonl")
+
+def file_checksum(path):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+class SessionJournal:
+    """
+    Append-only record of completed pipeline stages for one session.
+    Each line is {stage, time, data, artifacts: {path: {size, sha1}}, crc}. crc covers the
+    rest of the line, so a record torn by a crash is ignored on replay. The latest record
+    of a stage wins.
+    Stages: session, topic, script, music, tts_voice, tts:<i>, download:<i>, render,
+    upload:english, hindi_timeline, hindi_meta, hindi_tts_voice, hindi_tts:<i>, hindi_render, upload:hindi.
+    """
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.path = journal_path(session_id)
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.verified = {}
+        self._replay()
+
+    @staticmethod
+    def exists(session_id):
+        return os.path.exists(journal_path(session_id))
+
+    def _replay(self):
+        if not os.path.exists(self.path): return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    crc = entry.pop('crc', None)
+                    if crc != self._crc(entry): continue
+                    self.entries[entry['stage']] = entry
+                except Exception:
+                    continue # Torn / partial line from a crash
+
+    @staticmethod
+    def _crc(entry):
+        return hashlib.sha1(json.dumps(entry, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+    def record(self, stage, data=None, artifacts=None):
+        """Appends a completed stage (fsynced). artifacts: file paths that stage produced."""
+        files = {}
+        for path in artifacts or []:
+            if path and os.path.exists(path):
+                files[path] = {'size': os.path.getsize(path), 'sha1': file_checksum(path)}
+        entry = {'stage': stage, 'time': time.time(), 'data': data, 'artifacts': files}
+        line = dict(entry, crc=self._crc(entry))
+
+        with self.lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(line, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.entries[stage] = entry
+            self.verified[stage] = True
+
+    def get(self, stage, default=None):
+        """Data of the latest record of a stage (not checked against its artifacts)."""
+        entry = self.entries.get(stage)
+        return entry['data'] if entry else default
+
+    def done(self, stage):
+        """True if the stage is recorded and every artifact is still on disk with the same checksum."""
+        entry = self.entries.get(stage)
+        if not entry: return False
+        if stage not in self.verified:
+            ok = True
+            for path, meta in entry['artifacts'].items():
+                if not os.path.exists(path) or os.path.getsize(path) != meta['size'] or file_checksum(path) != meta['sha1']:
+                    ok = False
+                    break
+            self.verified[stage] = ok
+        return self.verified[stage]
+
+    def summary(self):
+        """'stage' names that are done, in the order they were first recorded."""
+        return [s for s in self.entries if self.done(s)]
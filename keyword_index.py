@@ -0,0 +1,288 @@
+# keyword_index.py (The Keyword Spotter)
+import os
+import re
+import time
+from collections import OrderedDict, deque
+
+# --- MATCHING RULES ---
+# colors / emoji: whole space-separated word, or substring when the keyword is longer than 4 letters
+# sfx:            plain substring (any length)
+# Earlier keywords win, exactly like the old dict scans.
+LONG_KEYWORD = 4
+
+# --- AHO-CORASICK AUTOMATON ---
+class KeywordAutomaton:
+    """All-substring matcher: one walk over the text finds every keyword occurrence (overlaps included)."""
+
+    def __init__(self, keywords):
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+        for kid, word in enumerate(keywords):
+            node = 0
+            for ch in word:
+                nxt = self.goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[node][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                node = nxt
+            self.out[node].append(kid)
+
+        # Breadth-first failure links (outputs of the fallback state are merged in)
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self.goto[node].items():
+                queue.append(nxt)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def find(self, text):
+        """Yields (end_index, keyword_id) for every occurrence."""
+        goto, fail, out = self.goto, self.fail, self.out
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for kid in out[node]:
+                yield i, kid
+
+# --- THE INDEX ---
+class KeywordIndex:
+    """
+    Precompiled lookup over SMART_SFX_MAP, EMOJI_MAP, KEYWORD_COLORS and SCENE_SFX_MAP.
+    annotate(text) returns every fact the editor needs about a piece of text from a single
+    automaton walk plus one token lookup. Results are memoised per text.
+    """
+
+    def __init__(self, sfx_map, emoji_map, keyword_colors, scene_sfx_map=None,
+                 emoji_dir="assets/emojis", sfx_folders=("assets/sfx", "assets"), memo_size=4096):
+        self.sfx_map = dict(sfx_map)
+        self.emoji_map = dict(emoji_map)
+        self.scene_sfx_map = dict(scene_sfx_map or {})
+        self.emoji_dir = emoji_dir
+        self.sfx_folders = list(sfx_folders)
+        self.memo = OrderedDict()
+        self.memo_size = memo_size
+        self.exists_cache = {}
+
+        # Color category rank per keyword (first category listing a keyword wins)
+        self.color_names = list(keyword_colors.keys())
+        color_rank = {}
+        for rank, (name, words) in enumerate(keyword_colors.items()):
+            for k in words:
+                color_rank.setdefault(k, rank)
+        emoji_rank = {k: rank for rank, k in enumerate(self.emoji_map)}
+        self.sfx_keywords = list(self.sfx_map)
+
+        # Whole-word table: token -> (color rank, emoji rank)
+        self.tokens = {}
+        for k, rank in color_rank.items():
+            self.tokens[k] = (rank, None)
+        for k, rank in emoji_rank.items():
+            self.tokens[k] = (self.tokens.get(k, (None, None))[0], rank)
+
+        # Substring automaton: every SFX keyword + long color/emoji keywords
+        patterns = {}
+        for rank, k in enumerate(self.sfx_keywords):
+            patterns.setdefault(k, [None, None, None])[2] = rank
+        for k, rank in color_rank.items():
+            if len(k) > LONG_KEYWORD: patterns.setdefault(k, [None, None, None])[0] = rank
+        for k, rank in emoji_rank.items():
+            if len(k) > LONG_KEYWORD: patterns.setdefault(k, [None, None, None])[1] = rank
+        self.patterns = list(patterns.keys())
+        self.pattern_ranks = [tuple(patterns[k]) for k in self.patterns]
+        self.automaton = KeywordAutomaton(self.patterns)
+        self.emoji_keywords = list(self.emoji_map)
+
+    # --- FILE CHECKS (Assets don't change mid-run) ---
+    def exists(self, path):
+        if path not in self.exists_cache:
+            self.exists_cache[path] = os.path.exists(path)
+        return self.exists_cache[path]
+
+    # --- CORE MATCH ---
+    def match(self, text):
+        """
+        Keyword-level matches for text (no file checks).
+        Returns {'color': category or None, 'emoji': [keywords by priority], 'sfx': [keywords by priority]}.
+        """
+        lower = text.lower()
+        color_ranks, emoji_ranks, sfx_ranks = set(), set(), set()
+
+        for token in lower.split(' '):
+            hit = self.tokens.get(token)
+            if hit:
+                if hit[0] is not None: color_ranks.add(hit[0])
+                if hit[1] is not None: emoji_ranks.add(hit[1])
+
+        for _, pid in self.automaton.find(lower):
+            c, e, s = self.pattern_ranks[pid]
+            if c is not None: color_ranks.add(c)
+            if e is not None: emoji_ranks.add(e)
+            if s is not None: sfx_ranks.add(s)
+
+        return {
+            'color': self.color_names[min(color_ranks)] if color_ranks else None,
+            'emoji': [self.emoji_keywords[r] for r in sorted(emoji_ranks)],
+            'sfx': [self.sfx_keywords[r] for r in sorted(sfx_ranks)],
+        }
+
+    def annotate(self, text, found=None):
+        """
+        Everything the editor asks about a text, resolved to files:
+        {'color', 'emoji_path', 'sfx_keyword', 'sfx_path'}. Memoised.
+        found: a precomputed match() result (used by annotate_timeline).
+        """
+        hit = self.memo.get(text)
+        if hit is not None:
+            self.memo.move_to_end(text)
+            return hit
+
+        if found is None: found = self.match(text)
+        result = {'color': found['color'], 'emoji_path': None, 'sfx_keyword': None, 'sfx_path': None}
+
+        for keyword in found['emoji']:
+            path = os.path.join(self.emoji_dir, self.emoji_map[keyword])
+            if self.exists(path):
+                result['emoji_path'] = path
+                break
+
+        for keyword in found['sfx']:
+            path = next((os.path.join(f, self.sfx_map[keyword]) for f in self.sfx_folders
+                         if self.exists(os.path.join(f, self.sfx_map[keyword]))), None)
+            if path:
+                result['sfx_keyword'], result['sfx_path'] = keyword, path
+                break
+
+        self.memo[text] = result
+        if len(self.memo) > self.memo_size:
+            self.memo.popitem(last=False)
+        return result
+
+    def scene_words(self, script_text):
+        """
+        Per-word events for a scene: [(word, scene_sfx_filename or None, emoji_path or None)].
+        Words are punctuation-stripped and lower-cased, as plan_scene_events expects.
+        """
+        words = re.sub(r'[^\w\s]', '', script_text).lower().split()
+        result = []
+        for word in words:
+            sfx = self.scene_sfx_map.get(word)
+            emoji = self.annotate(word)['emoji_path'] if word in self.emoji_map else None
+            result.append((word, sfx, emoji))
+        return result
+
+    def annotate_timeline(self, texts):
+        """
+        Annotates every scene of a timeline with one automaton walk over the joined text
+        (match offsets are bucketed back to scenes). Fills the memo and returns the list of annotations.
+        """
+        texts = [t or "" for t in texts]
+        pending = [i for i, t in enumerate(texts) if t not in self.memo]
+        if pending:
+            # '\n' never occurs inside a keyword, so matches can't straddle two scenes
+            lowered = [texts[i].lower() for i in pending]
+            joined = "\n".join(t.replace("\n", " ") for t in lowered)
+            bounds, pos = [], 0
+            for t in lowered:
+                pos += len(t) + 1
+                bounds.append(pos)
+
+            sfx_hits = [set() for _ in pending]
+            emoji_hits = [set() for _ in pending]
+            color_hits = [set() for _ in pending]
+            slot = 0
+            for end, pid in self.automaton.find(joined):
+                while end >= bounds[slot]: slot += 1
+                c, e, s = self.pattern_ranks[pid]
+                if c is not None: color_hits[slot].add(c)
+                if e is not None: emoji_hits[slot].add(e)
+                if s is not None: sfx_hits[slot].add(s)
+
+            for slot, i in enumerate(pending):
+                for token in lowered[slot].split(' '):
+                    hit = self.tokens.get(token)
+                    if hit:
+                        if hit[0] is not None: color_hits[slot].add(hit[0])
+                        if hit[1] is not None: emoji_hits[slot].add(hit[1])
+                found = {
+                    'color': self.color_names[min(color_hits[slot])] if color_hits[slot] else None,
+                    'emoji': [self.emoji_keywords[r] for r in sorted(emoji_hits[slot])],
+                    'sfx': [self.sfx_keywords[r] for r in sorted(sfx_hits[slot])],
+                }
+                self.annotate(texts[i], found)
+
+        return [self.annotate(t) for t in texts]
+
+# --- REFERENCE: THE OLD LINEAR SCANS (for the benchmark) ---
+def legacy_color(text, keyword_colors):
+    lower_text = text.lower()
+    for color_name, keywords in keyword_colors.items():
+        if any(f" {k} " in f" {lower_text} " for k in keywords) or any(k in lower_text for k in keywords if len(k) > 4):
+            return color_name
+    return None
+
+def legacy_emoji(text, emoji_map):
+    text_lower = text.lower()
+    for keyword in emoji_map:
+        if f" {keyword} " in f" {text_lower} " or (keyword in text_lower and len(keyword) > 4):
+            return keyword
+    return None
+
+def legacy_sfx(text, sfx_map):
+    text_lower = text.lower()
+    for keyword in sfx_map:
+        if keyword in text_lower: return keyword
+    return None
+
+# --- MICRO-BENCHMARK ---
+def benchmark(index, keyword_colors, texts, rounds=200):
+    """
+    Times the old per-call dict scans against index.match() on the same texts and checks they agree.
+    Returns {'legacy_s', 'index_s', 'speedup', 'mismatches'}.
+    """
+    mismatches = 0
+    for t in texts:
+        found = index.match(t)
+        if (found['color'] != legacy_color(t, keyword_colors)
+                or (found['emoji'][0] if found['emoji'] else None) != legacy_emoji(t, index.emoji_map)
+                or (found['sfx'][0] if found['sfx'] else None) != legacy_sfx(t, index.sfx_map)):
+            mismatches += 1
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for t in texts:
+            legacy_color(t, keyword_colors)
+            legacy_emoji(t, index.emoji_map)
+            legacy_sfx(t, index.sfx_map)
+    legacy_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for t in texts:
+            index.match(t)
+    index_s = time.perf_counter() - start
+
+    return {'legacy_s': legacy_s, 'index_s': index_s,
+            'speedup': legacy_s / index_s if index_s else 0.0, 'mismatches': mismatches}
+
+if __name__ == "__main__":
+    import media_engine
+    sample = [
+        "Stop doing this right now", "The secret money trick rich people hide",
+        "A dark mystery in outer space", "This robot will change the future of tech",
+        "Nobody noticed the clock on the wall", "Paisa aur zindagi ka raaz",
+        "Why the ocean is scarier than space", "He was a killer with a heart of gold",
+    ]
+    index = media_engine.get_keyword_index()
+    r = benchmark(index, media_engine.KEYWORD_COLORS, sample * 25)
+    print(f"Legacy scans: {r['legacy_s']:.3f}s | Index: {r['index_s']:.3f}s | "
+          f"{r['speedup']:.1f}x faster | Mismatches: {r['mismatches']}")
@@ -0,0 +1,158 @@
+# music_library.py (The Record Crate)
+import os
+import json
+import random
+import threading
+import config
+import ffmpeg_engine
+
+# --- LIBRARY LAYOUT ---
+BASE_FOLDER = "songs"
+MASTER_LIBRARY = os.path.join(BASE_FOLDER, "Master_Library")
+INDEX_PATH = os.path.join("cache", "music_index.json")
+
+MOODS = {
+    "Thrilling": ["thrill", "action", "fast", "dark"],
+    "Peaceful": ["peace", "calm", "ambient", "soft"],
+    "Informative": ["info", "news", "beat", "tech"],
+    "Upbeat": ["upbeat", "happy", "fun", "pop"],
+    "Sad": ["sad", "emotional", "slow", "piano"]
+}
+
+# --- THE INDEX ---
+class MusicLibrary:
+    """
+    Persistent index of every .mp3 in songs/<mood> and songs/Master_Library.
+    Entry per path: {folder, name, size, mtime, moods, duration, sample_rate, mean_db, max_db}.
+    refresh() only stats the folders; a track is probed (and its loudness measured with
+    volumedetect) when it is new or its size / mtime changed. Mood counts, track lists and
+    playlist planning then run from the index without opening any audio file.
+    """
+
+    def __init__(self, base_folder=BASE_FOLDER, index_path=INDEX_PATH):
+        self.base_folder = base_folder
+        self.master_library = os.path.join(base_folder, "Master_Library")
+        self.index_path = index_path
+        self.tracks = None
+        self.refreshed = False
+        self.lock = threading.Lock()
+
+    def _load(self):
+        if self.tracks is None:
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    self.tracks = json.load(f)
+            except Exception:
+                self.tracks = {}
+        return self.tracks
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+            tmp = self.index_path + f".{os.getpid()}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self.tracks, f, indent=1)
+            os.replace(tmp, self.index_path)
+        except Exception as e:
+            print(f"   [Music Index] Could not save index: {e}")
+
+    def ensure_folders(self):
+        """songs/, songs/Master_Library and one folder per mood (same layout get_music_mood always created)."""
+        for folder in [self.base_folder, self.master_library] + [os.path.join(self.base_folder, m) for m in MOODS]:
+            if not os.path.exists(folder): os.makedirs(folder)
+
+    @staticmethod
+    def tag_moods(folder, name):
+        """Moods a track belongs to: its mood folder, or every mood whose keyword is in a Master_Library filename."""
+        if folder != "Master_Library": return [folder] if folder in MOODS else []
+        lower = name.lower()
+        return [mood for mood, keywords in MOODS.items() if any(k in lower for k in keywords)]
+
+    @staticmethod
+    def analyse(path):
+        """Duration, sample rate and loudness of one track (one probe + one volumedetect decode)."""
+        info = ffmpeg_engine.probe_media(path)
+        loudness = ffmpeg_engine.measure_loudness(path)
+        return {'duration': info['duration'], 'sample_rate': info['sample_rate'],
+                'mean_db': loudness['mean_db'], 'max_db': loudness['max_db']}
+
+    def refresh(self, force=False):
+        """Brings the index in line with the folders (once per process unless force). Returns the number of tracks analysed."""
+        from concurrent.futures import ThreadPoolExecutor
+
+        with self.lock:
+            if self.refreshed and not force: return 0
+            tracks = self._load()
+            seen = set()
+            stale = []
+
+            folders = [("Master_Library", self.master_library)] + [(m, os.path.join(self.base_folder, m)) for m in MOODS]
+            for folder, folder_path in folders:
+                if not os.path.isdir(folder_path): continue
+                for item in os.scandir(folder_path):
+                    if not item.name.endswith(".mp3") or not item.is_file(): continue
+                    st = item.stat()
+                    seen.add(item.path)
+                    entry = tracks.get(item.path)
+                    if not entry or entry['size'] != st.st_size or entry['mtime'] != st.st_mtime:
+                        tracks[item.path] = {'folder': folder, 'name': item.name, 'size': st.st_size, 'mtime': st.st_mtime,
+                                             'moods': self.tag_moods(folder, item.name), 'duration': None,
+                                             'sample_rate': None, 'mean_db': None, 'max_db': None}
+                        stale.append(item.path)
+                    else:
+                        tracks[item.path]['moods'] = self.tag_moods(folder, item.name) # MOODS may have changed
+
+            removed = [p for p in tracks if p not in seen]
+            for p in removed: del tracks[p]
+
+            if stale:
+                print(f"   [Music Index] Analysing {len(stale)} new/changed tracks...")
+                workers = max(1, int(getattr(config, 'MUSIC_INDEX_WORKERS', 4)))
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    for path, meta in zip(stale, pool.map(self.analyse, stale)):
+                        tracks[path].update(meta)
+
+            if stale or removed: self._save()
+            self.refreshed = True
+            return len(stale)
+
+    def find(self, mood_name, keywords):
+        """Same selection as the old folder scan: songs/<mood> plus Master_Library names containing a keyword."""
+        self.refresh()
+        return [path for path, t in self.tracks.items()
+                if t['folder'] == mood_name or (t['folder'] == "Master_Library" and any(k in t['name'].lower() for k in keywords))]
+
+    def count(self, mood_name):
+        self.refresh()
+        return sum(1 for t in self.tracks.values() if mood_name in t['moods'])
+
+    def duration(self, path):
+        """Indexed duration of a track (None if unknown)."""
+        entry = self._load().get(path)
+        return entry['duration'] if entry else None
+
+    def plan_playlist(self, songs, total_duration, overlap=0.0):
+        """
+        DJ order for a Long-form bed: shuffled, reshuffled on wrap-around, until the tracks
+        (each shortened by overlap seconds) cover total_duration. Durations come from the index
+        (tracks outside it are probed).
+        """
+        songs = list(songs)
+        if not songs: return []
+        random.shuffle(songs)
+        playlist, covered, index = [], 0.0, 0
+        while covered < total_duration:
+            if index >= len(songs):
+                index = 0
+                random.shuffle(songs)
+            length = self.duration(songs[index])
+            if length is None: length = ffmpeg_engine.probe_media(songs[index])['duration'] or 0.0 # Not indexed
+            playlist.append(songs[index])
+            index += 1
+            covered += max(length - overlap, 0.0)
+            # A library with no usable durations would otherwise never cover the bed
+            if len(playlist) >= len(songs) and covered <= 0: break
+        return playlist
+
+# --- SHARED INSTANCE ---
+LIBRARY = MusicLibrary()
@@ -0,0 +1,374 @@
+# render_cache.py (The Film Vault)
+import os
+import json
+import shutil
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+import config
+import ffmpeg_engine
+
+# --- CACHE LOCATION ---
+CACHE_DIR = os.path.join("cache", "scenes")
+OUTRO_DIR = os.path.join("cache", "outro")
+FRAME_DIR = os.path.join("cache", "frames")
+
+# Bump when the scene renderer's output changes for the same inputs
+RENDER_VERSION = "1"
+
+# --- FILE DIGESTS (Re-hashed only when size/mtime change) ---
+class FileDigests:
+    """SHA-1 of file contents, remembered in index.json by path + size + mtime."""
+
+    def __init__(self, index_path):
+        self.index_path = index_path
+        self.index = None
+        self.dirty = False
+        self.lock = threading.Lock()
+
+    def _load(self):
+        if self.index is None:
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    self.index = json.load(f)
+            except Exception:
+                self.index = {}
+        return self.index
+
+    def digest(self, path):
+        """Content hash of path, or None if it does not exist."""
+        if not path or not os.path.exists(path): return None
+        with self.lock:
+            st = os.stat(path)
+            key = os.path.abspath(path)
+            entry = self._load().get(key)
+            if entry and entry['size'] == st.st_size and entry['mtime'] == st.st_mtime:
+                return entry['digest']
+
+            h = hashlib.sha1()
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    h.update(block)
+            self.index[key] = {'size': st.st_size, 'mtime': st.st_mtime, 'digest': h.hexdigest()}
+            self.dirty = True
+            return h.hexdigest()
+
+    def save(self):
+        if not self.dirty: return
+        try:
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+            tmp = self.index_path + f".{os.getpid()}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self.index, f, indent=1)
+            os.replace(tmp, self.index_path)
+            self.dirty = False
+        except Exception as e:
+            print(f"   [Scene Cache] Could not save digest index: {e}")
+
+# --- SCENE RENDER CACHE ---
+class SceneCache:
+    """
+    Rendered scene_*.mp4 files keyed by a hash of everything that goes into them:
+    visual bytes, narration bytes, caption timing, text, the SFX / emoji files it can use,
+    mode, audio mode and style config.
+    Files live in cache/scenes and are pruned least-recently-used above SCENE_CACHE_MAX_MB.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_mb=None):
+        self.cache_dir = cache_dir
+        self.max_bytes = int((max_mb or getattr(config, 'SCENE_CACHE_MAX_MB', 2000)) * 1024 * 1024)
+        self.digests = FileDigests(os.path.join(cache_dir, "digests.json"))
+        self.hits = 0
+        self.misses = 0
+
+    def enabled(self):
+        return bool(getattr(config, 'SCENE_CACHE', True))
+
+    @staticmethod
+    def stamp(path):
+        """path:size:mtime, so a replaced SFX / emoji file invalidates the scenes that use it."""
+        try:
+            st = os.stat(path)
+            return f"{path}:{st.st_size}:{int(st.st_mtime)}"
+        except OSError:
+            return f"{path}:missing"
+
+    def make_key(self, job):
+        """Hash of a render_scene_job job's inputs (output path, thread count and plate excluded)."""
+        mode = job['mode']
+        settings = getattr(config, 'VIDEO_SETTINGS', {}).get(mode, {})
+        inputs = {
+            'version': RENDER_VERSION,
+            'visual': self.digests.digest(job.get('source', job['video'])),
+            'audio': self.digests.digest(job['audio']),
+            'timing': self.digests.digest(job['timing']),
+            'text': job['text'],
+            'is_first': job['is_first'],
+            'assets': [self.stamp(p) for p in job.get('assets', ())],
+            'mode': mode,
+            'with_audio': job.get('with_audio', True),
+            'style': {
+                'settings': repr(settings),
+                'caption_backend': str(getattr(config, 'CAPTION_BACKEND', 'auto')),
+                'caption_fonts': repr(getattr(config, 'CAPTION_FONTS', {})),
+                'ken_burns': (getattr(config, 'KEN_BURNS', False), getattr(config, 'KEN_BURNS_ZOOM', 0.08)),
+            },
+        }
+        if inputs['visual'] is None or inputs['audio'] is None: return None
+        return hashlib.sha1(json.dumps(inputs, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".mp4")
+
+    def fetch(self, key, output_path):
+        """Places the cached render at output_path (hard link, else copy). Returns True on a hit."""
+        if not key:
+            return False
+        src = self._path(key)
+        if not os.path.exists(src):
+            self.misses += 1
+            return False
+        try:
+            if os.path.exists(output_path): os.remove(output_path)
+            try: os.link(src, output_path)
+            except OSError: shutil.copy2(src, output_path)
+            os.utime(src, None) # Touch -> recently used scenes survive pruning
+            self.hits += 1
+            return True
+        except Exception as e:
+            print(f"   [Scene Cache] Could not reuse scene: {e}")
+            self.misses += 1
+            return False
+
+    @staticmethod
+    def release(output_path):
+        """
+        Unlinks output_path before a scene is rendered over it. A hit may have hard-linked it to a
+        cache entry, and writing through that link (ffmpeg -y truncates in place) would corrupt the entry.
+        """
+        try:
+            if os.path.lexists(output_path): os.remove(output_path)
+        except OSError as e:
+            print(f"   [Scene Cache] Could not release {os.path.basename(output_path)}: {e}")
+
+    def store(self, key, rendered_path):
+        """Copies a fresh render into the cache (atomic), then prunes to the size budget."""
+        if not key or not os.path.exists(rendered_path): return
+        dst = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            tmp = dst + f".{os.getpid()}.tmp"
+            shutil.copy2(rendered_path, tmp)
+            os.replace(tmp, dst)
+        except Exception as e:
+            print(f"   [Scene Cache] Could not store scene: {e}")
+
+    def prune(self):
+        """Deletes least recently used renders until the cache is under its size budget."""
+        files = []
+        total = 0
+        for root, _, names in os.walk(self.cache_dir):
+            for name in names:
+                if not name.endswith(".mp4"): continue
+                p = os.path.join(root, name)
+                try:
+                    st = os.stat(p)
+                    files.append((st.st_mtime, st.st_size, p))
+                    total += st.st_size
+                except OSError: pass
+
+        if total <= self.max_bytes: return
+        files.sort()
+        for _, size, p in files:
+            try:
+                os.remove(p)
+                total -= size
+            except OSError: pass
+            if total <= self.max_bytes * 0.9: break
+
+    def finish(self):
+        """End of session: persist digests, enforce the budget, return (hits, misses) and reset."""
+        self.digests.save()
+        self.prune()
+        result = (self.hits, self.misses)
+        self.hits = self.misses = 0
+        return result
+
+# --- OUTRO CACHE ---
+class OutroCache:
+    """
+    assets/outro.mp4 normalised once per render profile and reused as the last concat segment.
+    Keyed by the source's content hash + resolution, fps and codec settings.
+    """
+
+    def __init__(self, cache_dir=OUTRO_DIR):
+        self.cache_dir = cache_dir
+        self.digests = FileDigests(os.path.join(cache_dir, "digests.json"))
+        self.lock = threading.Lock()
+
+    def make_key(self, source, target_size, fps=24, with_audio=True):
+        digest = self.digests.digest(source)
+        if digest is None: return None
+        profile = {
+            'version': RENDER_VERSION,
+            'size': list(target_size), 'fps': fps,
+            'video': "libx264/ultrafast/yuv420p",
+            'audio': "aac/44100/stereo" if with_audio else None,
+        }
+        return hashlib.sha1(json.dumps({'source': digest, 'profile': profile}, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def get(self, source, target_size, fps=24, with_audio=True):
+        """Path of the normalised outro for this profile (rendered on first use), or None."""
+        key = self.make_key(source, target_size, fps, with_audio)
+        if not key: return None
+        path = os.path.join(self.cache_dir, key + ".mp4")
+        with self.lock:
+            if os.path.exists(path): return path
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp = os.path.join(self.cache_dir, f"{key}.{os.getpid()}.tmp.mp4")
+            print(f"   [Outro Cache] Rendering outro for {target_size[0]}x{target_size[1]}...")
+            ok = ffmpeg_engine.render_outro(source, tmp, target_size, fps, with_audio)
+            if ok and os.path.exists(tmp):
+                os.replace(tmp, path)
+                self.digests.save()
+                return path
+            try:
+                if os.path.exists(tmp): os.remove(tmp)
+            except OSError: pass
+            return None
+
+# --- DECODED-FRAME CACHE ---
+class FrameCache:
+    """
+    Short clips decoded once to target-size RGB24 frames (<key>_<w>x<h>.rgb, raw, no header)
+    and opened as read-only np.memmap arrays of shape (n, h, w, 3). Loops, the Hindi twin and
+    re-renders index frames from the map instead of decoding the clip again; worker processes
+    mapping the same file share its pages. Keyed by source content hash + size + fps.
+    Budgets: FRAME_CACHE_MAX_SECONDS (longer clips are not cached), FRAME_CACHE_MAX_MB on disk
+    (least recently used files pruned) and FRAME_CACHE_RAM_MB of maps held open per process
+    (least recently used maps dropped). Off unless FRAME_CACHE = True.
+    """
+
+    def __init__(self, cache_dir=FRAME_DIR):
+        self.cache_dir = cache_dir
+        self.digests = FileDigests(os.path.join(cache_dir, "digests.json"))
+        self.maps = OrderedDict() # key -> memmap, most recently used last
+        self.rejected = set()     # keys probed once and found too long / over budget
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def enabled(self):
+        return bool(getattr(config, 'FRAME_CACHE', False))
+
+    def _budget(self, name, default_mb):
+        return int(float(getattr(config, name, default_mb)) * 1024 * 1024)
+
+    def make_key(self, source, target_size, fps=24):
+        digest = self.digests.digest(source)
+        if digest is None: return None
+        spec = {'version': RENDER_VERSION, 'source': digest, 'size': list(target_size), 'fps': fps}
+        return hashlib.sha1(json.dumps(spec, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def _path(self, key, target_size):
+        return os.path.join(self.cache_dir, f"{key}_{target_size[0]}x{target_size[1]}.rgb")
+
+    def accepts(self, source, target_size, fps=24):
+        """True if source is short enough to fit the cache budgets."""
+        if not self.enabled() or not source or not os.path.exists(source): return False
+        duration = ffmpeg_engine.probe_media(source)['duration']
+        if not duration or duration > float(getattr(config, 'FRAME_CACHE_MAX_SECONDS', 8)): return False
+        size = (int(duration * fps) + 2) * target_size[0] * target_size[1] * 3
+        return size <= min(self._budget('FRAME_CACHE_RAM_MB', 1536), self._budget('FRAME_CACHE_MAX_MB', 4096))
+
+    def get(self, source, target_size, fps=24):
+        """(n, h, w, 3) uint8 read-only map of source's frames, or None (disabled, over budget, decode failed)."""
+        if not self.enabled() or not source: return None
+        key = self.make_key(source, target_size, fps) # Content hash: stat-checked, no subprocess
+        if not key: return None
+        target_w, target_h = target_size
+        frame_bytes = target_w * target_h * 3
+
+        with self.lock:
+            if key in self.maps:
+                self.maps.move_to_end(key)
+                self.hits += 1
+                return self.maps[key]
+            if key in self.rejected: return None
+
+        # On disk already: mapped without probing. Only a real miss probes (budgets) and decodes,
+        # outside the lock so plates / other clips are not held up (tmp per pid, atomic rename)
+        path = self._path(key, target_size)
+        if os.path.exists(path):
+            with self.lock: self.hits += 1
+            try: os.utime(path) # LRU order for prune()
+            except OSError: pass
+        else:
+            if not self.accepts(source, target_size, fps):
+                with self.lock: self.rejected.add(key)
+                return None
+            with self.lock: self.misses += 1
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp = path + f".{os.getpid()}.{threading.get_ident()}.tmp"
+            print(f"   [Frame Cache] Decoding {os.path.basename(source)} once...")
+            if not ffmpeg_engine.decode_frames(source, tmp, target_size, fps) or os.path.getsize(tmp) < frame_bytes:
+                try:
+                    if os.path.exists(tmp): os.remove(tmp)
+                except OSError: pass
+                return None
+            os.replace(tmp, path) # Other workers never map a half-written file
+            with self.digests.lock: self.digests.save()
+            self.prune()
+
+        with self.lock:
+            try:
+                count = os.path.getsize(path) // frame_bytes
+                frames = np.memmap(path, dtype=np.uint8, mode='r', shape=(count, target_h, target_w, 3))
+            except Exception as e:
+                print(f"   [Frame Cache] Could not map {os.path.basename(source)}: {e}")
+                return None
+            self.maps[key] = frames
+            self.maps.move_to_end(key)
+            self._evict()
+            return frames
+
+    def _evict(self):
+        """Drops least recently used maps until the open ones fit FRAME_CACHE_RAM_MB (the newest always stays)."""
+        limit = self._budget('FRAME_CACHE_RAM_MB', 1536)
+        while len(self.maps) > 1 and sum(m.nbytes for m in self.maps.values()) > limit:
+            self.maps.popitem(last=False)
+
+    def prune(self):
+        """Deletes least recently used frame files until the cache is under FRAME_CACHE_MAX_MB."""
+        limit = self._budget('FRAME_CACHE_MAX_MB', 4096)
+        files = []
+        total = 0
+        try:
+            for item in os.scandir(self.cache_dir):
+                if not item.name.endswith(".rgb"): continue
+                st = item.stat()
+                files.append((st.st_mtime, st.st_size, item.path))
+                total += st.st_size
+        except OSError: return
+        
+        if total <= limit: return
+        files.sort()
+        for _, size, p in files[:-1]: # Never the file just written
+            try:
+                os.remove(p)
+                total -= size
+            except OSError: pass
+            if total <= limit: break
+
+    def stats(self):
+        """(hits, misses) since the last call, then reset."""
+        with self.lock:
+            result = (self.hits, self.misses)
+            self.hits = self.misses = 0
+        return result
+
+# --- SHARED INSTANCES ---
+SCENES = SceneCache()
+OUTROS = OutroCache()
+FRAMES = FrameCache()
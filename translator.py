@@ -146,11 +146,12 @@ def create_hindi_timeline(english_timeline):
     return hindi_timeline
 
 # --- HINDI AUDIO ENGINE (WITH ELASTIC SYNC) ---
-async def generate_hindi_audio(timeline, session_id):
+async def generate_hindi_audio(timeline, session_id, journal=None):
     print(f"   [Translator] Generating Hindi Audio (Swara/Madhur)...")
     
-    # Randomly pick a male or female voice
-    voice = random.choice(["hi-IN-SwaraNeural", "hi-IN-MadhurNeural"])
+    # Randomly pick a male or female voice (a resumed session keeps its voice)
+    voice = (journal.get('hindi_tts_voice') if journal else None) or random.choice(["hi-IN-SwaraNeural", "hi-IN-MadhurNeural"])
+    if journal and not journal.get('hindi_tts_voice'): journal.record('hindi_tts_voice', voice)
     print(f"   [Translator] Voice Selected: {voice}")
     
     audio_files = []
@@ -167,6 +168,10 @@ async def generate_hindi_audio(timeline, session_id):
         fname = os.path.join(TEMP_DIR, f"hindi_audio_{i}_{session_id}.mp3")
         tname = os.path.join(TEMP_DIR, f"hindi_timing_{i}_{session_id}.json")
         
+        if journal and journal.done(f"hindi_tts:{i}"):
+            audio_files.append(fname)
+            continue
+        
         try:
             # Generate Audio
             communicate = edge_tts.Communicate(text_to_speak, voice, rate="+30%")
@@ -210,6 +215,7 @@ async def generate_hindi_audio(timeline, session_id):
             
             if os.path.exists(fname):
                 audio_files.append(fname)
+                if journal: journal.record(f"hindi_tts:{i}", {'text': text_to_speak}, [fname, tname])
                 
         except Exception as e:
             print(f"   [Translator Error] Audio failed for scene {i}: {e}")